@@ -1,12 +1,25 @@
-from flask import Flask, render_template, redirect, url_for, flash, request
+from flask import Flask, render_template, flash, request
 from flask_migrate import Migrate
-from flask_login import login_required, current_user
-from models import db, Post, User, Comment, Like
+from flask_login import login_required
+from models import db, Post
 from auth import auth, login_manager
 from posts import posts
+from feed import paginate_feed, ensure_feed_generation
+from authors import paginate_authors, author_stats
+from commands import register_commands
+from evaluation import init_evaluation
+from duplicates import init_duplicates
+from fragments import init_fragments
+from metrics import init_metrics
+from guest_likes import init_guest_likes
+from leaderboards import init_leaderboards, get_leaderboards
+from search import init_search, search_posts
+from trending import init_trending
+from user_cache import init_user_cache
+from config import Config
 import os
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     
     # Configuration
@@ -34,47 +47,67 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['GOOGLE_CLIENT_ID'] = os.getenv('GOOGLE_CLIENT_ID')
     app.config['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
+    app.config['OPENAI_BASE_URL'] = os.getenv('OPENAI_BASE_URL')  # Optional, e.g. a local fake server
     app.config['ANTHROPIC_API_KEY'] = os.getenv('ANTHROPIC_API_KEY')
+    app.config['COMMENT_EVALUATOR'] = os.getenv('COMMENT_EVALUATOR', 'openai')  # 'openai' or 'stub'
+    app.config['EVALUATION_LOG_LEVEL'] = os.getenv('EVALUATION_LOG_LEVEL', 'INFO')  # DEBUG also logs prompts
+    app.config['EVALUATION_LOG_FILE'] = os.getenv('EVALUATION_LOG_FILE', Config.EVALUATION_LOG_FILE)
+    app.config['SLOW_REQUEST_MS'] = int(os.getenv('SLOW_REQUEST_MS', '0'))  # Log slower requests with their SQL; 0 disables
+    app.config['FRAGMENT_CACHE_URL'] = os.getenv('FRAGMENT_CACHE_URL')  # e.g. redis://localhost:6379/0, shared by workers
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')  # Bearer token for /metrics; unset hides the route
+    
+    # Overrides for benchmarks and scripts (e.g. an in-memory database)
+    if test_config:
+        app.config.update(test_config)
     
     # Initialize extensions
     db.init_app(app)
+    init_trending(app)
     login_manager.init_app(app)
     Migrate(app, db)
     
     # Register blueprints
     app.register_blueprint(auth, url_prefix='/api/auth')
     app.register_blueprint(posts, url_prefix='/api')
+    register_commands(app)
+    init_evaluation(app)
+    init_duplicates(app)
+    init_fragments(app)
+    init_guest_likes(app)
+    init_leaderboards(app)
+    init_user_cache(app)
+    init_metrics(app)
     
     # Create database tables
     with app.app_context():
         db.create_all()
+        ensure_feed_generation()
+    init_search(app)
     
     # Main routes
     @app.route('/')
     def index():
         post_type = request.args.get('type')
         sort = request.args.get('sort', 'recent')
+        cursor = request.args.get('cursor')
+        query = request.args.get('q', '').strip()
+
+        if query:
+            page = request.args.get('page', 1, type=int)
+            try:
+                posts, has_more = search_posts(query, post_type, page)
+            except RuntimeError:
+                flash('Căutarea nu este disponibilă momentan.', 'error')
+                posts, has_more = [], False
+            return render_template('posts/index.html', posts=posts, next_cursor=None,
+                                   next_page=page + 1 if has_more else None, query=query, Post=Post)
         
-        query = Post.query
-        
-        if post_type:
-            query = query.filter_by(post_type=post_type)
-        
-        # Apply sorting
-        if sort == 'recent':
-            query = query.order_by(Post.created_at.desc())
-        elif sort == 'likes':
-            # Order by number of likes (most liked first)
-            query = query.outerjoin(Post.likes).group_by(Post.id).order_by(db.func.count(Like.id).desc())
-        elif sort == 'comments':
-            # Order by number of comments (most commented first)
-            query = query.outerjoin(Post.comments).group_by(Post.id).order_by(db.func.count(Comment.id).desc())
-        elif sort == 'random':
-            # Random order
-            query = query.order_by(db.func.random())
-        
-        posts = query.all()
-        return render_template('posts/index.html', posts=posts, Post=Post)
+        try:
+            posts, next_cursor = paginate_feed(post_type, sort, cursor)
+        except ValueError:
+            # Stale or tampered cursor - start again from the first page
+            posts, next_cursor = paginate_feed(post_type, sort)
+        return render_template('posts/index.html', posts=posts, next_cursor=next_cursor, Post=Post)
 
     @app.route('/posts/create')
     @login_required
@@ -83,10 +116,11 @@ def create_app():
 
     @app.route('/posts/<int:post_id>')
     def view_post(post_id):
-        post = Post.query.get_or_404(post_id)
-        if post is None:
-            return render_template('404.html'), 404
-        return render_template('posts/view.html', post=post)
+        # Author joined in; comments are only loaded if their fragment is not cached
+        post = db.first_or_404(
+            db.select(Post).options(db.joinedload(Post.author)).where(Post.id == post_id)
+        )
+        return render_template('posts/view.html', post=post, author=author_stats(post.author))
 
     @app.route('/profile')
     @login_required
@@ -96,30 +130,14 @@ def create_app():
     @app.route('/authors')
     def authors_list():
         sort = request.args.get('sort', 'date')
+        page = request.args.get('page', 1, type=int)
         
-        query = User.query
-        
-        # Apply sorting
-        if sort == 'date':
-            # Sort by registration date (newest first)
-            query = query.order_by(User.created_at.desc())
-        elif sort == 'posts':
-            # Sort by number of posts (most posts first)
-            query = query.outerjoin(User.posts).group_by(User.id).order_by(db.func.count(Post.id).desc())
-        elif sort == 'likes':
-            # Sort by number of likes received (most likes first)
-            query = query.outerjoin(User.posts).outerjoin(Post.likes).group_by(User.id).order_by(db.func.count(Like.id).desc())
-        
-        authors = query.all()
-        
-        # Calculate likes received for each author
-        for author in authors:
-            likes_received = 0
-            for post in author.posts:
-                likes_received += len(post.likes)
-            author.likes_received = likes_received
+        # Sorted by registration date, post count or likes received; the
+        # first pages of the two rankings are read from the leaderboards
+        ranking = get_leaderboards().top(sort) if sort in ('posts', 'likes') else None
+        authors = paginate_authors(sort, page, ranking=ranking)
             
-        return render_template('authors_list.html', authors=authors)
+        return render_template('authors_list.html', authors=authors, sort=sort)
 
     @app.errorhandler(404)
     def not_found_error(error):
@@ -4,6 +4,8 @@ from flask_login import LoginManager, login_user, logout_user, login_required, c
 from google.oauth2 import id_token
 from google.auth.transport import requests
 from models import db, User, UserActivity
+from counters import touch_author_posts, add_points
+from user_cache import load_user as load_cached_user
 from http import HTTPStatus
 from config import Config
 from datetime import datetime, timedelta
@@ -14,7 +16,7 @@ login_manager = LoginManager()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return load_cached_user(int(user_id))
 
 @auth.route('/register', methods=['POST'])
 def register():
@@ -60,7 +62,7 @@ def login():
         if not activity:
             # First login of the day
             activity = UserActivity(user_id=user.id, login_date=today, points_awarded=True)
-            user.points += Config.DAILY_LOGIN_REWARD
+            add_points(user.id, Config.DAILY_LOGIN_REWARD, 'daily_login')
             db.session.add(activity)
             
             # Calculate days since last login to award membership points
@@ -71,7 +73,7 @@ def login():
             
             if last_activity and last_activity.login_date == yesterday:
                 # Consecutive login - award membership points for the day
-                user.points += Config.DAILY_MEMBERSHIP_REWARD
+                add_points(user.id, Config.DAILY_MEMBERSHIP_REWARD, 'membership_day')
             
             db.session.commit()
             
@@ -119,7 +121,7 @@ def google_login():
         if not activity:
             # First login of the day
             activity = UserActivity(user_id=user.id, login_date=today, points_awarded=True)
-            user.points += Config.DAILY_LOGIN_REWARD
+            add_points(user.id, Config.DAILY_LOGIN_REWARD, 'daily_login')
             db.session.add(activity)
             
             # Calculate days since last login to award membership points
@@ -130,7 +132,7 @@ def google_login():
             
             if last_activity and last_activity.login_date == yesterday:
                 # Consecutive login - award membership points for the day
-                user.points += Config.DAILY_MEMBERSHIP_REWARD
+                add_points(user.id, Config.DAILY_MEMBERSHIP_REWARD, 'membership_day')
             
             db.session.commit()
             
@@ -167,7 +169,11 @@ def profile():
 def update_profile():
     data = request.get_json()
 
-    current_user.name = data.get('name', current_user.name)
+    name = data.get('name', current_user.name)
+    if name != current_user.name:
+        # The name is shown on cached post cards and comment blocks
+        touch_author_posts(current_user)
+    current_user.name = name
     current_user.favorite_quote = data.get('favorite_quote', current_user.favorite_quote)
 
     db.session.commit()
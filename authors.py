@@ -0,0 +1,145 @@
+from collections import namedtuple
+from models import db, User, Post, Comment, UserActivity
+from config import Config
+
+# Author directory statistics. A page first picks its users (sorted on the
+# users table, or taken from a leaderboard ranking, see leaderboards.py), then
+# aggregates post/comment counts and last activity with one GROUP BY subquery
+# per table restricted to those users, so a page costs the same few queries
+# however many authors, posts or likes there are. Likes received come from the
+# denormalized User.likes_received counter.
+
+AuthorStats = namedtuple('AuthorStats', ['author', 'post_count', 'comment_count', 'likes_received', 'last_active'])
+
+AuthorPage = namedtuple('AuthorPage', ['items', 'page', 'pages', 'total'])
+
+SORT_MODES = ('date', 'posts', 'likes')
+
+def _latest(*values):
+    # Post/comment timestamps are datetimes, logins are dates; compare as dates
+    dates = [v.date() if hasattr(v, 'date') else v for v in values if v is not None]
+    return max(dates) if dates else None
+
+def author_stats(author):
+    """AuthorStats for a single author, counted in one query."""
+    post_count = db.select(db.func.count(Post.id)).where(Post.user_id == author.id).scalar_subquery()
+    comment_count = db.select(db.func.count(Comment.id)).where(Comment.user_id == author.id).scalar_subquery()
+    last_post = db.select(db.func.max(Post.created_at)).where(Post.user_id == author.id).scalar_subquery()
+    last_comment = db.select(db.func.max(Comment.created_at)).where(Comment.user_id == author.id).scalar_subquery()
+    last_login = (
+        db.select(db.func.max(UserActivity.login_date))
+        .where(UserActivity.user_id == author.id)
+        .scalar_subquery()
+    )
+    posts, comments, post_at, comment_at, login_at = db.session.execute(
+        db.select(post_count, comment_count, last_post, last_comment, last_login)
+    ).one()
+    return AuthorStats(
+        author=author,
+        post_count=posts,
+        comment_count=comments,
+        likes_received=author.likes_received,
+        last_active=_latest(post_at, comment_at, login_at)
+    )
+
+def _page_user_ids(sort, start, per_page, exclude=()):
+    # Only the users table is sorted, except by post count, which needs one
+    # index-only GROUP BY over post
+    query = db.select(User.id)
+    if exclude:
+        query = query.where(User.id.not_in(exclude))
+    if sort == 'posts':
+        counts = (
+            db.select(Post.user_id, db.func.count(Post.id).label('post_count'))
+            .group_by(Post.user_id)
+            .subquery()
+        )
+        query = query.outerjoin(counts, counts.c.user_id == User.id).order_by(
+            db.func.coalesce(counts.c.post_count, 0).desc(), User.id.desc()
+        )
+    elif sort == 'likes':
+        query = query.order_by(User.likes_received.desc(), User.id.desc())
+    else:
+        query = query.order_by(User.created_at.desc(), User.id.desc())
+    return db.session.scalars(query.limit(per_page).offset(start)).all()
+
+def paginate_authors(sort='date', page=1, per_page=None, ranking=None):
+    """Return one AuthorPage of the author directory with aggregated statistics.
+
+    The page's users are picked first, then statistics are aggregated for
+    those users only. ranking is an optional precomputed [(user_id, score)]
+    order for sort (a leaderboard snapshot): its users fill the first places
+    and are shown with their ranked score, so the order and the numbers
+    agree, and every other user follows in SQL order. Each user is listed
+    exactly once whichever source a page comes from.
+    """
+    per_page = per_page or Config.AUTHORS_PAGE_SIZE
+    page = max(page, 1)
+    start = (page - 1) * per_page
+    ranking = ranking or []
+    ranked = dict(ranking[start:start + per_page])
+    user_ids = [user_id for user_id, _ in ranking[start:start + per_page]]
+    if len(user_ids) < per_page:
+        user_ids += _page_user_ids(
+            sort, max(start - len(ranking), 0), per_page - len(user_ids),
+            exclude=[user_id for user_id, _ in ranking]
+        )
+
+    posts_sq = (
+        db.select(
+            Post.user_id,
+            db.func.count(Post.id).label('post_count'),
+            db.func.max(Post.created_at).label('last_post')
+        )
+        .where(Post.user_id.in_(user_ids))
+        .group_by(Post.user_id)
+        .subquery()
+    )
+    comments_sq = (
+        db.select(
+            Comment.user_id,
+            db.func.count(Comment.id).label('comment_count'),
+            db.func.max(Comment.created_at).label('last_comment')
+        )
+        .where(Comment.user_id.in_(user_ids))
+        .group_by(Comment.user_id)
+        .subquery()
+    )
+    logins_sq = (
+        db.select(UserActivity.user_id, db.func.max(UserActivity.login_date).label('last_login'))
+        .where(UserActivity.user_id.in_(user_ids))
+        .group_by(UserActivity.user_id)
+        .subquery()
+    )
+
+    query = (
+        db.select(
+            User,
+            db.func.coalesce(posts_sq.c.post_count, 0),
+            db.func.coalesce(comments_sq.c.comment_count, 0),
+            posts_sq.c.last_post,
+            comments_sq.c.last_comment,
+            logins_sq.c.last_login
+        )
+        .outerjoin(posts_sq, posts_sq.c.user_id == User.id)
+        .outerjoin(comments_sq, comments_sq.c.user_id == User.id)
+        .outerjoin(logins_sq, logins_sq.c.user_id == User.id)
+        .where(User.id.in_(user_ids))
+    )
+    total = db.session.scalar(db.select(db.func.count(User.id)))
+    rows = db.session.execute(query).all() if user_ids else []
+    position = {user_id: index for index, user_id in enumerate(user_ids)}
+    rows.sort(key=lambda row: position[row[0].id])
+
+    items = [
+        AuthorStats(
+            author=author,
+            post_count=ranked.get(author.id, posts) if sort == 'posts' else posts,
+            comment_count=comments,
+            likes_received=ranked.get(author.id, author.likes_received) if sort == 'likes' else author.likes_received,
+            last_active=_latest(last_post, last_comment, last_login)
+        )
+        for author, posts, comments, last_post, last_comment, last_login in rows
+    ]
+    pages = max((total + per_page - 1) // per_page, 1)
+    return AuthorPage(items=items, page=page, pages=pages, total=total)
@@ -0,0 +1,746 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the Flask app.
+Runs against a throwaway SQLite database (in memory, or a temporary file
+for the load test), so it never touches the development database.
+
+    python benchmark.py authors
+    python benchmark.py post-detail
+    python benchmark.py load --scale medium --concurrency 8 --output results.json
+    python benchmark.py load --compare results.json
+    python benchmark.py like-stress
+    python benchmark.py random-feed
+    python benchmark.py query-plans
+    python benchmark.py llm-client
+"""
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, date
+import openai
+from sqlalchemy import event
+from app import create_app
+from models import db, User, Post, Comment, Like, UserActivity
+from counters import recount_all
+from ledger import open_balances, unbalanced_users
+from metrics import REQUEST_QUERIES
+from config import Config
+from seeding import POST_TYPES, generate_rows, bulk_load, sentence
+from feed import paginate_feed
+from llm_client import LLMClient, CircuitBreaker, CircuitOpenError
+
+
+# Evaluation records from benchmark runs stay out of the real evaluation log
+BENCH_EVALUATION_LOG = os.path.join(tempfile.gettempdir(), 'scrisurinoi-benchmark-evaluation.log')
+
+def build_app(database_uri='sqlite://', **config):
+    """Create the app on a fresh database (in-memory SQLite by default)."""
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SECRET_KEY': 'benchmark',
+        'EVALUATION_LOG_FILE': BENCH_EVALUATION_LOG,
+        'EVALUATION_SWEEP_INTERVAL': 0,
+        **config
+    })
+
+@contextmanager
+def count_queries(app):
+    """Count SQL statements executed inside the block; yields a one-item list."""
+    counter = [0]
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_execute)
+
+def seed_authors(app, authors, posts_per_author, likes_per_post, seed=42):
+    """Create authors with posts, comments and likes; counters are kept consistent."""
+    rng = random.Random(seed)
+    with app.app_context():
+        users = [User(email=f'user{i}@example.com', name=f'Autor {i}') for i in range(authors)]
+        db.session.add_all(users)
+        db.session.flush()
+
+        for user in users:
+            for _ in range(posts_per_author):
+                post = Post(
+                    title='Titlu', content='text ' * 50, post_length=250,
+                    post_type=rng.choice(POST_TYPES), user_id=user.id
+                )
+                db.session.add(post)
+                db.session.flush()
+                db.session.add(Comment(content='Un comentariu', user_id=rng.choice(users).id, post_id=post.id))
+                post.comment_count = 1
+                for liker in rng.sample(users, min(likes_per_post, len(users))):
+                    db.session.add(Like(user_id=liker.id, post_id=post.id))
+                post.like_count = min(likes_per_post, len(users))
+                user.likes_received += post.like_count
+        db.session.commit()
+
+def bench_authors(scales):
+    """Query count and latency of /authors for each (authors, posts, likes) scale."""
+    print(f"{'authors':>8} {'posts':>6} {'likes':>6} {'sort':>6} {'queries':>8} {'ms':>8}")
+    for authors, posts_per_author, likes_per_post in scales:
+        app = build_app()
+        seed_authors(app, authors, posts_per_author, likes_per_post)
+        client = app.test_client()
+        for sort in ['date', 'posts', 'likes']:
+            with count_queries(app) as counter:
+                start = time.perf_counter()
+                response = client.get(f'/authors?sort={sort}')
+                elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200
+            print(f'{authors:>8} {authors * posts_per_author:>6} '
+                  f'{authors * posts_per_author * likes_per_post:>6} {sort:>6} {counter[0]:>8} {elapsed:>8.1f}')
+
+# Maximum SQL statements per request, independent of the number of comments.
+# The post page budget assumes a cold fragment cache.
+QUERY_BUDGETS = {
+    '/api/posts/{id}': 4,
+    '/posts/{id}': 6
+}
+
+def seed_commented_post(app, comments, seed=42):
+    """Create one post with `comments` comments, each by a different author. Returns the post id."""
+    rng = random.Random(seed)
+    with app.app_context():
+        users = [User(email=f'reader{i}@example.com', name=f'Cititor {i}') for i in range(comments + 1)]
+        db.session.add_all(users)
+        db.session.flush()
+        post = Post(title='Titlu', content='vers\n' * 40, post_length=200, post_type='poetry',
+                    user_id=users[0].id, comment_count=comments)
+        db.session.add(post)
+        db.session.flush()
+        db.session.add_all([
+            Comment(content='Un comentariu', user_id=user.id, post_id=post.id,
+                    ai_score=rng.randint(1, 100), like_count=rng.randint(0, 5))
+            for user in users[1:]
+        ])
+        db.session.commit()
+        return post.id
+
+def bench_post_detail(comment_counts):
+    """Query count and latency of the post endpoints; returns False if a budget is exceeded."""
+    within_budget = True
+    print(f"{'comments':>8} {'endpoint':>16} {'queries':>8} {'budget':>7} {'ms':>8}")
+    for comments in comment_counts:
+        app = build_app()
+        post_id = seed_commented_post(app, comments)
+        client = app.test_client()
+        for endpoint, budget in QUERY_BUDGETS.items():
+            app.extensions['fragment_cache'].backend.clear()
+            with count_queries(app) as counter:
+                start = time.perf_counter()
+                response = client.get(endpoint.format(id=post_id))
+                elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200
+            within_budget = within_budget and counter[0] <= budget
+            flag = '' if counter[0] <= budget else '  OVER BUDGET'
+            print(f'{comments:>8} {endpoint:>16} {counter[0]:>8} {budget:>7} {elapsed:>8.1f}{flag}')
+    return within_budget
+
+# Load test: dataset sizes and the request mix
+
+SCALES = {
+    'small': {'users': 50, 'posts': 200, 'comments': 1000, 'likes': 2000, 'activity_days': 30},
+    'medium': {'users': 500, 'posts': 2000, 'comments': 20000, 'likes': 40000, 'activity_days': 90},
+    'large': {'users': 5000, 'posts': 20000, 'comments': 200000, 'likes': 400000, 'activity_days': 180}
+}
+
+BENCH_PASSWORD = 'benchmark123'
+
+def seed_dataset(app, users, posts, comments, likes, activity_days, seed=42, chunk_size=10000):
+    """Create a realistic dataset over all post types and return the row counts."""
+    with app.app_context():
+        rows = generate_rows(users, posts, comments, likes, activity_days, seed, BENCH_PASSWORD)
+        counts, _ = bulk_load(rows, chunk_size, report_every=0)
+        recount_all()
+        open_balances()
+        db.session.commit()
+        return counts
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+# name -> (weight, URL rule used for per-request query counts)
+SCENARIOS = {
+    'index': (25, '/'),
+    'authors': (5, '/authors'),
+    'view_post': (30, '/posts/<int:post_id>'),
+    'api_posts': (20, '/api/posts'),
+    'like_post': (15, '/api/posts/<int:post_id>/like'),
+    'add_comment': (5, '/api/posts/<int:post_id>/comments')
+}
+
+def _request(client, name, rng, posts):
+    post_id = rng.randint(1, posts)
+    if name == 'index':
+        return client.get('/')
+    if name == 'authors':
+        return client.get(f"/authors?sort={rng.choice(['date', 'posts', 'likes'])}")
+    if name == 'view_post':
+        return client.get(f'/posts/{post_id}')
+    if name == 'api_posts':
+        return client.get(f"/api/posts?sort={rng.choice(['recent', 'likes', 'comments'])}")
+    if name == 'like_post':
+        return client.post(f'/api/posts/{post_id}/like')
+    return client.post(f'/api/posts/{post_id}/comments', json={'content': sentence(rng, rng.randint(10, 40))})
+
+def run_load(app, posts, concurrency, requests, seed=42):
+    """Drive the scenario mix from `concurrency` threads through the WSGI app.
+
+    Returns ({scenario: [(seconds, status), ...]}, wall seconds).
+    """
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][0] for name in names]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        # Every worker is a different logged-in reader
+        client.post('/api/auth/login', json={'email': f'user{index + 1}@example.com', 'password': BENCH_PASSWORD})
+        local = []
+        barrier.wait()
+        for _ in range(requests // concurrency):
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            response = _request(client, name, rng, posts)
+            local.append((name, time.perf_counter() - start, response.status_code))
+        with lock:
+            for name, elapsed, status in local:
+                samples[name].append((elapsed, status))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+def _temporary_database():
+    # A file, not :memory:, so concurrent threads get their own connections
+    workdir = tempfile.mkdtemp(prefix='scrisurinoi-bench-')
+    return f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+def _sqlite_options(database_uri):
+    return {'connect_args': {'timeout': 30}} if database_uri.startswith('sqlite') else {}
+
+def check_like_consistency():
+    """List of problems between likes, counters and points (empty when consistent).
+
+    Assumes every point a user has beyond `baseline` came from likes.
+    """
+    problems = []
+    duplicates = db.session.execute(
+        db.select(Like.user_id, Like.post_id, Like.comment_id)
+        .group_by(Like.user_id, Like.post_id, Like.comment_id)
+        .having(db.func.count() > 1)
+    ).all()
+    if duplicates:
+        problems.append(f'{len(duplicates)} duplicate likes')
+    for post in Post.query.all():
+        actual = Like.query.filter_by(post_id=post.id).count()
+        if post.like_count != actual:
+            problems.append(f'post {post.id}: like_count {post.like_count}, {actual} likes')
+    for comment in Comment.query.all():
+        actual = Like.query.filter_by(comment_id=comment.id).count()
+        if comment.like_count != actual:
+            problems.append(f'comment {comment.id}: like_count {comment.like_count}, {actual} likes')
+    return problems
+
+def expected_like_points(user_id):
+    """Points a user should have earned from likes given and received."""
+    given = Like.query.filter_by(user_id=user_id).count()
+    on_posts = Like.query.join(Post, Like.post_id == Post.id).filter(Post.user_id == user_id).count()
+    on_comments = Like.query.join(Comment, Like.comment_id == Comment.id).filter(Comment.user_id == user_id).count()
+    return (given * Config.LIKE_GIVEN_REWARD + on_posts * Config.POST_LIKE_REWARD
+            + on_comments * Config.COMMENT_LIKE_REWARD)
+
+def bench_like_stress(threads=16, rounds=100, users=4, seed=42):
+    """Hammer a few posts and comments with concurrent like requests, then check the books.
+
+    Threads share users (two or more clients per user), so the same like is
+    toggled and set from several requests at once, like double clicks.
+    Returns True when counters, likes, points and the points ledger are consistent.
+    """
+    database_uri = _temporary_database()
+    app = build_app(database_uri, COMMENT_EVALUATOR='stub', SQLALCHEMY_ENGINE_OPTIONS=_sqlite_options(database_uri))
+    seed_dataset(app, users=users, posts=3, comments=3, likes=0, activity_days=1, seed=seed)
+
+    clients = []
+    for index in range(threads):
+        client = app.test_client()
+        client.post('/api/auth/login', json={'email': f'user{index % users + 1}@example.com', 'password': BENCH_PASSWORD})
+        clients.append(client)
+    with app.app_context():
+        baseline = {user.id: user.points for user in User.query.all()}
+
+    statuses = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = clients[index]
+        barrier.wait()
+        for _ in range(rounds):
+            target = rng.choice(['posts', 'comments'])
+            body = rng.choice([None, {'liked': True}, {'liked': False}])
+            response = client.post(f'/api/{target}/{rng.randint(1, 3)}/like', json=body)
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        problems = check_like_consistency()
+        for user in User.query.all():
+            expected = baseline[user.id] + expected_like_points(user.id)
+            if user.points != expected:
+                problems.append(f'user {user.id}: {user.points} points, expected {expected}')
+        for user_id, points, balance in unbalanced_users():
+            problems.append(f'user {user_id}: {points} points, points ledger says {balance}')
+        likes = Like.query.count()
+
+    print(f'{threads * rounds} like requests from {threads} threads in {elapsed:.1f}s, '
+          f'statuses {statuses}, {likes} likes left')
+    for problem in problems:
+        print(f'  INCONSISTENT: {problem}')
+    print('Consistent.' if not problems else f'{len(problems)} problems.')
+    return not problems
+
+def _random_feed_queries(post_type, per_page):
+    # The random feed before shuffle keys: a whole-table sort per page
+    query = Post.query.options(db.defer(Post.content), db.undefer(Post.excerpt), db.selectinload(Post.author))
+    if post_type:
+        query = query.filter(Post.post_type == post_type)
+    seed = random.randrange(1 << 16, 2147483647)
+    computed_key = (Post.id * seed) % 2147483647
+    return {
+        'order by random()': lambda: query.order_by(db.func.random()).limit(per_page).all(),
+        'computed key': lambda: query.order_by(computed_key.desc(), Post.id.desc()).limit(per_page).all(),
+        'shuffle key': lambda: paginate_feed(post_type, 'random', per_page=per_page)[0]
+    }
+
+def check_random_walk(app, post_type=None, per_page=20):
+    """Follow random-feed cursors to the end; True if every post shows up exactly once."""
+    with app.app_context():
+        query = db.select(db.func.count(Post.id))
+        if post_type:
+            query = query.where(Post.post_type == post_type)
+        expected = db.session.scalar(query)
+        seen, cursor = [], None
+        while True:
+            posts, cursor = paginate_feed(post_type, 'random', cursor, per_page)
+            seen.extend(post.id for post in posts)
+            if cursor is None:
+                return len(seen) == expected and len(set(seen)) == expected
+
+def bench_random_feed(post_counts, per_page=20, runs=20):
+    """Latency of one random-feed page, old queries vs shuffle keys; returns False if a walk repeats or skips posts."""
+    ok = True
+    print(f"{'posts':>8} {'type':>8} {'query':>18} {'ms/page':>8}")
+    for posts in post_counts:
+        app = build_app()
+        seed_dataset(app, users=100, posts=posts, comments=0, likes=0, activity_days=0)
+        with app.app_context():
+            for post_type in (None, 'poetry'):
+                for name, run in _random_feed_queries(post_type, per_page).items():
+                    run()  # Warm up
+                    start = time.perf_counter()
+                    for _ in range(runs):
+                        run()
+                    elapsed = (time.perf_counter() - start) * 1000 / runs
+                    print(f'{posts:>8} {post_type or "all":>8} {name:>18} {elapsed:>8.2f}')
+                db.session.expunge_all()
+        for post_type in (None, 'poetry'):
+            if not check_random_walk(app, post_type, per_page):
+                print(f'  Random walk over {posts} posts ({post_type or "all"}) repeated or skipped posts')
+                ok = False
+    return ok
+
+@contextmanager
+def capture_statements(app):
+    """Collect the (statement, parameters) of the SELECT, UPDATE and DELETE statements this thread runs in the block.
+
+    Statements from background threads (evaluation, leaderboards) are left out.
+    """
+    statements = []
+    thread = threading.get_ident()
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() != thread or executemany:
+            return
+        if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_execute)
+
+def hot_requests(app, client):
+    """Issue the busiest requests through the test client; returns (name, statements, allowed plan lines) for each.
+
+    Covers every feed sort with and without a type filter (first page and a
+    cursor page), the home, post, authors and search pages, the post API,
+    login and like toggles.
+    """
+    captured = []
+
+    def request(name, url, method='GET', allow=(), **options):
+        with capture_statements(app) as statements:
+            response = client.open(url, method=method, **options)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: {method} {url} returned {response.status_code}')
+        captured.append((name, statements, allow))
+        return response
+
+    with app.app_context():
+        post = db.session.scalars(db.select(Post).where(Post.comment_count > 0).limit(1)).one()
+        post_id, comment_id, title_word = post.id, post.comments[0].id, post.title.split()[0]
+        email = db.session.scalar(db.select(User.email).where(User.id == post.user_id))
+
+    for post_type in (None, 'poetry'):
+        for sort in ('recent', 'likes', 'comments', 'trending', 'random'):
+            name = f"feed: {sort}{' by type' if post_type else ''}"
+            args = {'sort': sort, **({'type': post_type} if post_type else {})}
+            first = request(name, '/api/posts', query_string=args)
+            request(f'{name}, page 2', '/api/posts', query_string={**args, 'cursor': first.get_json()['next_cursor']})
+    request('home page', '/')
+    # Ranking by relevance sorts the matches, never the whole table
+    request('search', '/api/search', query_string={'q': title_word}, allow=('USE TEMP B-TREE FOR ORDER BY',))
+    request('authors page', '/authors')
+    request('authors page: likes, page 5', '/authors', query_string={'sort': 'likes', 'page': 5})
+    request('login', '/api/auth/login', 'POST', json={'email': email, 'password': BENCH_PASSWORD})
+    request('post page', f'/posts/{post_id}')
+    request('post api', f'/api/posts/{post_id}')
+    request('like toggle: post', f'/api/posts/{post_id}/like', 'POST')
+    request('like toggle: comment', f'/api/comments/{comment_id}/like', 'POST')
+    return captured
+
+def plan_problems(statement, parameters):
+    """Full table scans and whole-result sorts in the statement's query plan, as plan lines."""
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        # Small benchmark tables would always be scanned; only complain where no index applies
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = [row[0] for row in connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)]
+        return [line.strip() for line in plan if 'Seq Scan' in line]
+    plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    # SCAN CONSTANT ROW and SCAN (subquery-N) read a single row or a subquery's result, not a table
+    return [line for line in plan
+            if (line.startswith('SCAN ') and 'INDEX' not in line
+                and not line.startswith(('SCAN CONSTANT ROW', 'SCAN (subquery')))
+            or 'TEMP B-TREE' in line]
+
+def check_query_plans(database_uri=None):
+    """EXPLAIN the statements the busiest requests run on a seeded database; False if any scans or sorts a table."""
+    database_uri = database_uri or _temporary_database()
+    app = build_app(database_uri, COMMENT_EVALUATOR='stub', SQLALCHEMY_ENGINE_OPTIONS=_sqlite_options(database_uri))
+    seed_dataset(app, users=500, posts=2000, comments=8000, likes=16000, activity_days=30)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+    captured = hot_requests(app, app.test_client())
+    app.extensions['evaluation_queue'].join()
+
+    ok = True
+    with app.app_context():
+        for name, statements, allow in captured:
+            problems = {}
+            for statement, parameters in statements:
+                for line in plan_problems(statement, parameters):
+                    if not line.startswith(allow):
+                        problems.setdefault(line, ' '.join(statement.split())[:160])
+            print(f"{name:<30} {'ok' if not problems else ''}")
+            for line, statement in problems.items():
+                print(f'    {line}  <-  {statement}')
+            ok = ok and not problems
+        db.session.rollback()
+    print('Every hot request uses indexes only.' if ok else 'Some hot requests scan or sort whole tables.')
+    return ok
+
+class FakeLLMHandler(http.server.BaseHTTPRequestHandler):
+    """Chat-completions endpoint that answers from the server's script: 'ok', an HTTP status, or 'slow'."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            action = server.script.pop(0) if server.script else server.default
+        if action == 'slow':
+            time.sleep(server.slow_seconds)
+            action = 'ok'
+        try:
+            if action == 'ok':
+                body = json.dumps({
+                    'id': 'fake', 'object': 'chat.completion', 'created': 0, 'model': 'fake',
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': '{"score": 50}'}}]
+                }).encode('utf-8')
+                self.send_response(200)
+            else:
+                body = json.dumps({'error': {'message': f'fake {action}'}}).encode('utf-8')
+                self.send_response(int(action))
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client hit its deadline and hung up
+
+    def log_message(self, format, *args):
+        pass
+
+@contextmanager
+def fake_llm_server(slow_seconds=2.0):
+    """Start FakeLLMHandler on a free local port; yields the server (set .script / .default, read .requests)."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FakeLLMHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.script, server.default, server.requests, server.slow_seconds = [], 'ok', 0, slow_seconds
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def check_llm_client():
+    """Drive LLMClient through OPENAI_BASE_URL-style access to a fake server; False if any behaviour is off.
+
+    Covers a plain call, retries with backoff on 500/429, no retry on 400,
+    the overall deadline, and the circuit breaker ignoring 400s, opening,
+    short-circuiting and closing again after a successful trial call.
+    """
+    results = []
+
+    def check(name, ok, detail=''):
+        results.append(ok)
+        print(f"{name:<34} {'ok' if ok else 'FAILED'} {detail}")
+
+    messages = [{'role': 'user', 'content': 'Evaluate'}]
+    logging.disable(logging.WARNING)  # The failures below are expected; keep the report readable
+    with fake_llm_server() as server:
+        def client(**options):
+            return LLMClient(api_key='fake', base_url=f'http://127.0.0.1:{server.server_port}/v1',
+                             breaker=options.pop('breaker', CircuitBreaker(100, 60)), **options)
+
+        def run(llm, script, default='ok'):
+            server.script, server.default, server.requests = list(script), default, 0
+            started = time.perf_counter()
+            try:
+                outcome = llm.complete(messages)
+            except Exception as e:
+                outcome = e
+            return outcome, server.requests, time.perf_counter() - started
+
+        outcome, requests, _ = run(client(), [])
+        check('plain call', outcome == '{"score": 50}' and requests == 1, f'{requests} request(s)')
+
+        outcome, requests, elapsed = run(client(max_retries=2, backoff=0.05), ['500', '429'])
+        check('retry 500 and 429, then succeed', outcome == '{"score": 50}' and requests == 3,
+              f'{requests} requests in {elapsed:.2f}s')
+
+        outcome, requests, _ = run(client(max_retries=2, backoff=0.05), [], default='500')
+        check('give up after max retries', isinstance(outcome, openai.InternalServerError) and requests == 3,
+              f'{requests} requests, {type(outcome).__name__}')
+
+        outcome, requests, _ = run(client(max_retries=2, backoff=0.05), ['400'])
+        check('no retry on 400', isinstance(outcome, openai.BadRequestError) and requests == 1,
+              f'{requests} request(s), {type(outcome).__name__}')
+
+        outcome, requests, elapsed = run(client(deadline=0.5, max_retries=5, backoff=0.05), [], default='slow')
+        check('deadline covers retries', isinstance(outcome, openai.APITimeoutError) and elapsed < 1.0,
+              f'{type(outcome).__name__} after {elapsed:.2f}s')
+
+        breaker = CircuitBreaker(3, 0.3)
+        llm = client(max_retries=0, breaker=breaker)
+        for _ in range(3):
+            run(llm, ['400'])
+        check('400s leave the breaker closed', breaker.state == CircuitBreaker.CLOSED, breaker.state)
+        for _ in range(3):
+            run(llm, [], default='500')
+        check('breaker opens after 3 failures', breaker.state == CircuitBreaker.OPEN, breaker.state)
+        outcome, requests, _ = run(llm, [])
+        check('open breaker skips the provider', isinstance(outcome, CircuitOpenError) and requests == 0,
+              f'{requests} request(s)')
+        time.sleep(0.35)
+        outcome, requests, _ = run(llm, [])
+        check('trial call closes the breaker', outcome == '{"score": 50}' and breaker.state == CircuitBreaker.CLOSED,
+              breaker.state)
+
+    logging.disable(logging.NOTSET)
+    print('LLM client behaves as configured.' if all(results) else 'LLM client checks failed.')
+    return all(results)
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def bench_load(scale, concurrency, requests, seed, database_uri=None):
+    """Seed a dataset, run the request mix and return the results as a dict."""
+    database_uri = database_uri or _temporary_database()
+    app = build_app(database_uri, COMMENT_EVALUATOR='stub', SQLALCHEMY_ENGINE_OPTIONS=_sqlite_options(database_uri))
+    sizes = SCALES[scale]
+    started = time.perf_counter()
+    dataset = seed_dataset(app, seed=seed, **sizes)
+    seed_seconds = time.perf_counter() - started
+    concurrency = min(concurrency, sizes['users'])
+
+    queries_before = REQUEST_QUERIES.totals()
+    samples, wall = run_load(app, sizes['posts'], concurrency, requests, seed)
+    queries_after = REQUEST_QUERIES.totals()
+    app.extensions['evaluation_queue'].join()
+
+    endpoints = {}
+    for name, (weight, rule) in SCENARIOS.items():
+        latencies = sorted(elapsed for elapsed, _ in samples[name])
+        count, total = queries_after.get((rule,), (0, 0))
+        before_count, before_total = queries_before.get((rule,), (0, 0))
+        count, total = count - before_count, total - before_total
+        endpoints[name] = {
+            'requests': len(latencies),
+            'errors': sum(1 for _, status in samples[name] if status >= 500),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            'throughput_rps': round(len(latencies) / wall, 1),
+            'queries_per_request': round(total / count, 2) if count else None
+        }
+
+    completed = sum(endpoint['requests'] for endpoint in endpoints.values())
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'database': database_uri.split(':', 1)[0],
+            'scale': scale,
+            'concurrency': concurrency,
+            'seed': seed
+        },
+        'dataset': {**dataset, 'seed_seconds': round(seed_seconds, 1)},
+        'total': {
+            'requests': completed,
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'seconds': round(wall, 2),
+            'throughput_rps': round(completed / wall, 1)
+        },
+        'endpoints': endpoints
+    }
+
+def print_load(results):
+    total = results['total']
+    print(f"{total['requests']} requests in {total['seconds']} s, {total['throughput_rps']} req/s, "
+          f"{total['errors']} errors ({results['meta']['scale']} dataset, "
+          f"concurrency {results['meta']['concurrency']})")
+    print(f"{'endpoint':>12} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'queries':>8}")
+    for name, e in results['endpoints'].items():
+        queries = '-' if e['queries_per_request'] is None else e['queries_per_request']
+        print(f"{name:>12} {e['requests']:>6} {e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8} "
+              f"{e['throughput_rps']:>8} {queries:>8}")
+
+def compare_load(baseline, results, tolerance):
+    """Print p95 and query-count changes against a baseline run; returns False on a regression."""
+    ok = True
+    print(f"\n{'endpoint':>12} {'p95 before':>11} {'p95 now':>8} {'change':>8} {'queries':>12}")
+    for name, now in results['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if not before:
+            continue
+        change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        queries = f"{before['queries_per_request']} -> {now['queries_per_request']}"
+        regressed = change > tolerance or (
+            before['queries_per_request'] is not None and now['queries_per_request'] is not None
+            # The mix varies slightly between runs; a real N+1 adds whole queries
+            and now['queries_per_request'] - before['queries_per_request'] > 0.5
+        )
+        ok = ok and not regressed
+        print(f"{name:>12} {before['p95_ms']:>11} {now['p95_ms']:>8} {change:>+8.0%} {queries:>12}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the literary app')
+    parser.add_argument('benchmark', choices=['authors', 'post-detail', 'load', 'like-stress', 'random-feed', 'query-plans', 'llm-client'])
+    parser.add_argument('--scale', choices=list(SCALES), default='small', help='load: dataset size')
+    parser.add_argument('--concurrency', type=int, default=8, help='load: concurrent clients')
+    parser.add_argument('--requests', type=int, default=2000, help='load: total requests')
+    parser.add_argument('--seed', type=int, default=42, help='load: random seed for data and request mix')
+    parser.add_argument('--database-uri', help='load, query-plans: run against this database instead of a temporary/in-memory SQLite one')
+    parser.add_argument('--output', help='load: write the results to this JSON file')
+    parser.add_argument('--compare', help='load: baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='load: allowed p95 slowdown before failing')
+    args = parser.parse_args()
+
+    if args.benchmark == 'authors':
+        bench_authors([(10, 2, 2), (50, 5, 5), (200, 5, 20)])
+    elif args.benchmark == 'post-detail':
+        if not bench_post_detail([1, 50, 300]):
+            sys.exit(1)
+    elif args.benchmark == 'like-stress':
+        if not bench_like_stress(threads=args.concurrency * 2, seed=args.seed):
+            sys.exit(1)
+    elif args.benchmark == 'random-feed':
+        if not bench_random_feed([1000, 10000, 100000]):
+            sys.exit(1)
+    elif args.benchmark == 'query-plans':
+        if not check_query_plans(args.database_uri):
+            sys.exit(1)
+    elif args.benchmark == 'llm-client':
+        if not check_llm_client():
+            sys.exit(1)
+    elif args.benchmark == 'load':
+        results = bench_load(args.scale, args.concurrency, args.requests, args.seed, args.database_uri)
+        print_load(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+        if args.compare:
+            with open(args.compare, encoding='utf-8') as f:
+                baseline = json.load(f)
+            if not compare_load(baseline, results, args.tolerance):
+                sys.exit(1)
@@ -0,0 +1,188 @@
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from config import Config
+from models import db, Comment
+from counters import recount_all
+from evaluation import get_evaluation_queue
+from evaluation_cache import prune_evaluation_cache
+from duplicates import rebuild_signatures, rebuild_bands
+from rescore import rescore_comments
+from seeding import generate_rows, read_jsonl, bulk_load
+from ledger import open_balances, compact_ledger, unbalanced_users
+from feed import reshuffle_posts
+from search import rebuild_search_index
+from trending import recompute_hot_scores
+
+@click.command('recount')
+@with_appcontext
+def recount_command():
+    """Rebuild like/comment counters from the base tables."""
+    recount_all()
+    db.session.commit()
+    click.echo('Counters recomputed.')
+
+@click.command('evaluate-pending')
+@with_appcontext
+def evaluate_pending_command():
+    """Score comments left pending (queue full or process restarted)."""
+    evaluation_queue = get_evaluation_queue()
+    comment_ids = db.session.scalars(
+        db.select(Comment.id).where(Comment.evaluation_status == 'pending').order_by(Comment.id)
+    ).all()
+    for comment_id in comment_ids:
+        evaluation_queue.process(comment_id)
+    click.echo(f'Evaluated {len(comment_ids)} pending comments.')
+
+@click.command('rebuild-duplicate-index')
+@click.option('--all', 'recompute', is_flag=True, help='Recompute signatures that already exist.')
+@click.option('--chunk-size', default=1000, show_default=True)
+@with_appcontext
+def rebuild_duplicate_index_command(recompute, chunk_size):
+    """Compute near-duplicate signatures for existing comments and rebuild the LSH bands."""
+    updated = rebuild_signatures(chunk_size=chunk_size, recompute=recompute)
+    indexed = rebuild_bands(chunk_size=chunk_size)
+    click.echo(f'Updated signatures for {updated} comments, indexed {indexed}.')
+
+@click.command('rescore-comments')
+@click.option('--concurrency', default=4, show_default=True, help='Evaluations running at once.')
+@click.option('--rate', type=float, default=None, help='Maximum evaluations per second (default: unlimited).')
+@click.option('--chunk-size', default=200, show_default=True, help='Comments read and written per batch.')
+@click.option('--checkpoint', default='rescore.checkpoint', show_default=True, help='File used to resume an interrupted run.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and start from the first comment.')
+@click.option('--include-flagged', is_flag=True, help='Also re-score comments flagged as spam or copied.')
+@click.option('--evaluator', type=click.Choice(['openai', 'stub']), default=None, help='Override COMMENT_EVALUATOR.')
+@with_appcontext
+def rescore_comments_command(concurrency, rate, chunk_size, checkpoint, restart, include_flagged, evaluator):
+    """Re-evaluate existing comments and reconcile user points."""
+    processed, elapsed = rescore_comments(
+        current_app._get_current_object(),
+        evaluator=evaluator,
+        concurrency=concurrency,
+        rate=rate,
+        chunk_size=chunk_size,
+        checkpoint_path=checkpoint,
+        restart=restart,
+        include_flagged=include_flagged,
+        echo=click.echo
+    )
+    throughput = processed / elapsed if elapsed else 0.0
+    click.echo(f'Done: {processed} comments in {elapsed:.1f}s ({throughput:.1f} comments/s).')
+
+def _finish_bulk_load(counts, elapsed):
+    # Counters are derived data: one set-based recount instead of per-row bookkeeping
+    started = time.perf_counter()
+    recount_all()
+    opened = open_balances()
+    recompute_hot_scores()
+    if current_app.extensions.get('search') is not None:
+        rebuild_search_index()
+    db.session.commit()
+    # Near-duplicate signatures and LSH bands for the new comments, so copy detection sees them
+    rebuild_signatures()
+    rebuild_bands(missing_only=True)
+    rows = sum(counts.values())
+    click.echo(', '.join(f'{count} {table}' for table, count in counts.items() if count))
+    click.echo(f'Loaded {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s), '
+               f'counters, search and duplicate indexes rebuilt in {time.perf_counter() - started:.1f}s.')
+    if opened:
+        click.echo(f'Opened points ledger balances for {opened} users.')
+
+@click.command('seed')
+@click.option('--users', default=1000, show_default=True)
+@click.option('--posts', default=5000, show_default=True)
+@click.option('--comments', default=50000, show_default=True)
+@click.option('--likes', default=100000, show_default=True, help='A tenth of them go to comments.')
+@click.option('--activity-days', default=30, show_default=True, help='Days of login history per user.')
+@click.option('--seed', default=42, show_default=True, help='Same seed, same data.')
+@click.option('--password', default='password123', show_default=True, help='Password of every generated user.')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows per INSERT/COPY batch.')
+@with_appcontext
+def seed_command(users, posts, comments, likes, activity_days, seed, password, chunk_size):
+    """Append a generated dataset with batched bulk inserts."""
+    rows = generate_rows(users, posts, comments, likes, activity_days, seed, password)
+    _finish_bulk_load(*bulk_load(rows, chunk_size, echo=click.echo))
+
+@click.command('import-jsonl')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows per INSERT/COPY batch.')
+@with_appcontext
+def import_jsonl_command(paths, chunk_size):
+    """Import rows from JSONL files, one {"table": ..., columns...} object per line."""
+    _finish_bulk_load(*bulk_load(read_jsonl(paths), chunk_size, echo=click.echo))
+
+@click.command('rebuild-search-index')
+@click.option('--chunk-size', default=1000, show_default=True, help='Posts indexed per statement.')
+@with_appcontext
+def rebuild_search_index_command(chunk_size):
+    """Rebuild the full-text search index from the post table."""
+    started = time.perf_counter()
+    try:
+        indexed = rebuild_search_index(chunk_size)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f'Indexed {indexed} posts in {time.perf_counter() - started:.1f}s.')
+
+@click.command('recompute-trending')
+@click.option('--chunk-size', default=1000, show_default=True, help='Posts recomputed per batch.')
+@with_appcontext
+def recompute_trending_command(chunk_size):
+    """Rebuild every post's trending score from likes and comments (run periodically, e.g. hourly)."""
+    started = time.perf_counter()
+    updated = recompute_hot_scores(chunk_size)
+    db.session.commit()
+    click.echo(f'Recomputed {updated} hot scores in {time.perf_counter() - started:.1f}s.')
+
+@click.command('reshuffle-posts')
+@with_appcontext
+def reshuffle_posts_command():
+    """Draw new random-feed positions for every post (run periodically to vary the order)."""
+    updated = reshuffle_posts()
+    db.session.commit()
+    click.echo(f'Reshuffled {updated} posts.')
+
+@click.command('compact-points')
+@click.option('--prune', is_flag=True, help='Delete the events folded into snapshots.')
+@with_appcontext
+def compact_points_command(prune):
+    """Fold settled points ledger events into per-user snapshots (run periodically, e.g. from cron)."""
+    folded = compact_ledger(prune=prune)
+    db.session.commit()
+    click.echo(f'Folded {folded} points events into snapshots{" and pruned them" if prune and folded else ""}.')
+
+@click.command('prune-evaluation-cache')
+@with_appcontext
+def prune_evaluation_cache_command():
+    """Delete expired AI evaluation cache entries (run periodically, e.g. daily)."""
+    pruned = prune_evaluation_cache(Config.EVALUATION_CACHE_TTL)
+    db.session.commit()
+    click.echo(f'Pruned {pruned} expired evaluation cache entries.')
+
+@click.command('verify-points')
+@click.option('--limit', default=20, show_default=True, help='Mismatches to list.')
+@with_appcontext
+def verify_points_command(limit):
+    """Compare every user's points with the balance recomputed from the ledger."""
+    mismatches = unbalanced_users(limit)
+    for user_id, points, balance in mismatches:
+        click.echo(f'User {user_id}: {points} points, ledger says {balance}')
+    if mismatches:
+        raise click.ClickException('Points do not match the ledger.')
+    click.echo('All balances match the ledger.')
+
+def register_commands(app):
+    """Attach the maintenance commands to the Flask CLI."""
+    app.cli.add_command(recount_command)
+    app.cli.add_command(evaluate_pending_command)
+    app.cli.add_command(rebuild_duplicate_index_command)
+    app.cli.add_command(rescore_comments_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(import_jsonl_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(recompute_trending_command)
+    app.cli.add_command(reshuffle_posts_command)
+    app.cli.add_command(compact_points_command)
+    app.cli.add_command(prune_evaluation_cache_command)
+    app.cli.add_command(verify_points_command)
@@ -16,6 +16,8 @@ class Config:
     POST_LIKE_REWARD = 2  # Points awarded to post author for receiving a like
     COMMENT_LIKE_REWARD = 1  # Points awarded to comment author for receiving a like
     LIKE_GIVEN_REWARD = 1  # Points awarded for giving a like
+    GUEST_LIKE_FLUSH_INTERVAL = 5  # Seconds between writes of buffered guest likes
+    GUEST_LIKE_FLUSH_SIZE = 500  # Buffered guest likes that trigger an early write
     
     # Points for comments based on quality
     COMMENT_QUALITY_REWARDS = {
@@ -33,3 +35,69 @@ class Config:
     # Points for daily activities
     DAILY_LOGIN_REWARD = 1  # Points for logging in (once per day)
     DAILY_MEMBERSHIP_REWARD = 1  # Points for each day of membership
+    POINTS_SNAPSHOT_SETTLE_SECONDS = 60  # Ledger events younger than this are left out of snapshots
+
+    # Feed pagination
+    FEED_PAGE_SIZE = 20  # Posts per page on the home feed
+    FEED_MAX_PAGE_SIZE = 50  # Upper bound for the per_page API parameter
+    SEARCH_MAX_TERMS = 8  # Words of a search query that are used
+
+    # Trending feed: an event's weight halves every TRENDING_HALF_LIFE_HOURS
+    TRENDING_HALF_LIFE_HOURS = 24
+    TRENDING_POST_WEIGHT = 1.0  # Publication, so new posts can surface
+    TRENDING_LIKE_WEIGHT = 1.0
+    TRENDING_COMMENT_WEIGHT = 2.0
+    TRENDING_QUALITY_WEIGHT = 3.0  # Times ai_score / 100, added once a comment is scored
+    AUTHORS_PAGE_SIZE = 24  # Authors per page in the author directory
+
+    # Leaderboards (top authors by points, likes, posts and comment quality)
+    LEADERBOARD_SIZE = 100  # Entries ranked per board (twice as many kept); deeper author pages fall back to SQL
+    LEADERBOARD_POLL_SECONDS = 2  # Seconds between background reads of new points ledger events
+    LEADERBOARD_RECONCILE_SECONDS = 300  # Seconds between background reloads from the database
+
+    # Background comment evaluation
+    EVALUATION_WORKERS = 2  # Threads scoring comments
+    EVALUATION_QUEUE_SIZE = 200  # Comments waiting to be scored before new ones are left pending
+    EVALUATION_STALE_AFTER = 120  # Seconds a comment may stay pending before the sweep queues it again
+    EVALUATION_SWEEP_INTERVAL = 60  # Seconds between sweeps for stale pending comments; 0 disables them
+    EVALUATION_CACHE_SIZE = 4096  # Evaluations kept in the in-memory LRU tier
+    EVALUATION_CACHE_TTL = 30 * 24 * 3600  # Seconds a cached evaluation is reused before it expires
+
+    # LLM client used for evaluations
+    LLM_MODEL = 'o3-mini'
+    LLM_DEADLINE = 30  # Seconds per evaluation call, retries included
+    LLM_MAX_RETRIES = 2  # Extra attempts for timeouts, connection errors, 429 and 5xx
+    LLM_BACKOFF = 0.5  # Base seconds for jittered exponential backoff
+    LLM_POOL_SIZE = 8  # Pooled keep-alive connections to the provider
+    LLM_BREAKER_THRESHOLD = 5  # Consecutive failures that open the circuit
+    LLM_BREAKER_RESET = 60  # Seconds before a trial call is let through again
+
+    # Instrumentation
+    SLOW_REQUEST_STATEMENTS = 5  # Slowest SQL statements included in a slow-request log entry
+
+    # HTTP caching of the JSON API
+    API_VERSION = 1  # Part of every ETag; bump when a response format changes
+    API_CACHE_MAX_AGE = 10  # Seconds a shared cache may serve a response without revalidating
+    API_CACHE_STALE_WHILE_REVALIDATE = 30
+
+    # Rendered-fragment cache
+    FRAGMENT_CACHE_SIZE = 2048  # Fragments kept by the in-process backend
+    FRAGMENT_CACHE_TTL = 3600  # Seconds, for the Redis backend
+
+    # Logged-in users kept by the Flask-Login user loader, see user_cache.py
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 30  # Seconds; bounds how stale another worker's copy can be
+
+    # Prompt budgeting
+    PROMPT_POST_TOKEN_BUDGET = 1200  # Max tokens of post content sent with each comment
+    PROMPT_CHARS_PER_TOKEN = 4  # Estimate used for budgeting
+    POST_CONTEXT_CACHE_SIZE = 256  # Prepared post contexts kept in memory
+
+    # Local copied-comment detection
+    DUPLICATE_THRESHOLD = 0.8  # Estimated Jaccard similarity at which a comment counts as copied
+    DUPLICATE_MIN_WORDS = 8  # Shorter comments ("Superb!") are never flagged
+
+    # Evaluation log (JSON lines, written by a background thread)
+    EVALUATION_LOG_FILE = 'ai_evaluation.log'
+    EVALUATION_LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate after 5 MB
+    EVALUATION_LOG_BACKUPS = 3  # Rotated files to keep
@@ -0,0 +1,161 @@
+from datetime import datetime
+from models import db, User, Post, Comment, Like
+from ledger import record_points
+from trending import record_heat, remove_heat
+from config import Config
+
+# Denormalized counters (Post.like_count, Post.comment_count, Comment.like_count,
+# User.likes_received). The helpers below assign SQL expressions instead of
+# Python values, so the flush emits "SET col = col + :delta" and concurrent
+# requests cannot lose each other's increments. They never commit; the caller
+# commits them together with the row that caused the change.
+#
+# New likes and comments also heat up the post's trending score, and unlikes
+# and deleted comments cool it down again (trending.py).
+#
+# Every change that alters how a post or its comments render also bumps
+# Post.version and Post.updated_at, which key the rendered-fragment cache
+# (see fragments.py) and the ETag / Last-Modified headers of the JSON API,
+# feed pages included (feed.py).
+#
+# add_points / spend_points change User.points with one atomic UPDATE on the
+# user row instead of a read-modify-write in Python, and append the change
+# to the points ledger (ledger.py) in the same transaction.
+
+def record_post_like(post, delta, liked_at=None):
+    """Adjust like counters for a post and its author by delta (+1 / -1).
+
+    For an unlike, liked_at is when the removed like was given, so its
+    trending heat can be taken back.
+    """
+    post.like_count = Post.like_count + delta
+    post.author.likes_received = User.likes_received + delta
+    if delta > 0:
+        record_heat(post, Config.TRENDING_LIKE_WEIGHT)
+    elif liked_at is not None:
+        remove_heat(post, (Config.TRENDING_LIKE_WEIGHT, liked_at))
+    touch_post(post)
+
+def record_comment_like(comment, delta):
+    """Adjust the like counter of a comment by delta (+1 / -1)."""
+    comment.like_count = Comment.like_count + delta
+    touch_post(comment.post)
+
+def record_comment(post, delta, comment=None):
+    """Adjust the comment counter of a post by delta (+1 / -1).
+
+    For a deletion, pass the comment to take back its trending heat.
+    """
+    post.comment_count = Post.comment_count + delta
+    if delta > 0:
+        record_heat(post, Config.TRENDING_COMMENT_WEIGHT)
+    elif comment is not None:
+        remove_heat(
+            post,
+            (Config.TRENDING_COMMENT_WEIGHT, comment.created_at),
+            (Config.TRENDING_QUALITY_WEIGHT * (comment.ai_score or 0) / 100, comment.created_at)
+        )
+    touch_post(post)
+
+def add_points(user_id, delta, reason, ref_id=None, floor=None):
+    """Atomically add delta to a user's points (UPDATE ... SET points = points + :delta) and log it.
+
+    With floor set, a deduction is reduced so it never takes the balance
+    below floor; the user row is locked first so the logged delta is the
+    one applied.
+    Unlike the counters above this runs immediately, so a user who likes
+    their own post gets both adjustments instead of the last assignment.
+    """
+    if floor is not None:
+        points = db.session.scalar(
+            db.select(User.points).where(User.id == user_id).with_for_update()
+        ) or 0
+        if points + delta < floor:
+            delta = max(delta, min(floor - points, 0))
+    if not delta:
+        return
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(points=User.points + delta),
+        execution_options={'synchronize_session': False}
+    )
+    record_points(user_id, delta, reason, ref_id)
+
+def spend_points(user_id, cost, reason, ref_id=None):
+    """Deduct cost only if the user can afford it, in one UPDATE. Returns True if it was deducted."""
+    result = db.session.execute(
+        db.update(User).where(User.id == user_id, User.points >= cost).values(points=User.points - cost),
+        execution_options={'synchronize_session': False}
+    )
+    if result.rowcount != 1:
+        return False
+    if cost:
+        record_points(user_id, -cost, reason, ref_id)
+    return True
+
+def touch_post(post):
+    """Bump the version of a post whose rendering changed."""
+    post.version = Post.version + 1
+    post.updated_at = datetime.utcnow()
+
+def touch_posts(post_ids):
+    """Bump the version of several posts in one UPDATE."""
+    if post_ids:
+        db.session.execute(
+            db.update(Post).where(Post.id.in_(post_ids))
+            .values(version=Post.version + 1, updated_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        )
+
+def touch_author_posts(user):
+    """Bump every post the user wrote or commented on, e.g. after a name change."""
+    commented = db.select(Comment.post_id).where(Comment.user_id == user.id)
+    db.session.execute(
+        db.update(Post)
+        .where(db.or_(Post.user_id == user.id, Post.id.in_(commented)))
+        .values(version=Post.version + 1, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+
+def record_post_deleted(post):
+    """Remove a post's likes from its author's likes_received before deleting it."""
+    if post.like_count:
+        post.author.likes_received = User.likes_received - post.like_count
+
+def _copy_counts(column, counts):
+    """Zero a counter column, then fill it from a (key, total) GROUP BY subquery with UPDATE ... FROM."""
+    model = column.class_
+    options = {'synchronize_session': False}
+    db.session.execute(db.update(model).values({column: 0}), execution_options=options)
+    db.session.execute(
+        db.update(model).where(model.id == counts.c.key).values({column: counts.c.total}),
+        execution_options=options
+    )
+
+def _grouped_count(key_column):
+    return (
+        db.select(key_column.label('key'), db.func.count().label('total'))
+        .where(key_column.isnot(None))
+        .group_by(key_column)
+        .subquery()
+    )
+
+def recount_all():
+    """Recompute every denormalized counter from the base tables.
+
+    Each counter is aggregated once with GROUP BY and copied in with a
+    set-based UPDATE, so the cost grows with the table sizes rather than
+    with posts x likes. The caller is responsible for committing.
+    """
+    _copy_counts(Post.like_count, _grouped_count(Like.post_id))
+    _copy_counts(Post.comment_count, _grouped_count(Comment.post_id))
+    _copy_counts(Comment.like_count, _grouped_count(Like.comment_id))
+    # Summed from the freshly recounted posts rather than joined through every like
+    _copy_counts(User.likes_received, (
+        db.select(Post.user_id.label('key'), db.func.sum(Post.like_count).label('total'))
+        .group_by(Post.user_id)
+        .subquery()
+    ))
+    db.session.execute(
+        db.update(Post).values(version=Post.version + 1, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
@@ -0,0 +1,171 @@
+import re
+import zlib
+from array import array
+from random import Random
+from flask import current_app
+from models import db, Comment, CommentBand
+from config import Config
+from evaluation_cache import normalize_comment
+
+# Local near-duplicate detection for comments. Each comment gets a MinHash
+# signature over its word 3-shingles (stored in Comment.minhash), and an LSH
+# index buckets signatures by band so a lookup only compares against the
+# handful of comments sharing a band. The buckets live in the comment_band
+# table (one indexed row per comment and band), so every worker sees the same
+# index, memory does not grow with the comment table and deleted comments
+# leave it in the same transaction. Copies are flagged in add_comment before
+# anything is sent to the LLM.
+
+SHINGLE_SIZE = 3
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 31) - 1
+
+# Fixed seed: signatures are persisted, so the permutations must never change
+_rng = Random(20250401)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_word = re.compile(r'\w+')
+
+def shingles(content):
+    """Set of word n-gram hashes for the normalized comment text."""
+    words = _word.findall(normalize_comment(content))
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {
+        zlib.crc32(' '.join(words[i:i + SHINGLE_SIZE]).encode('utf-8'))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+def minhash(content):
+    """MinHash signature of a comment as a tuple of NUM_PERM ints, or None if it has no words."""
+    hashes = shingles(content)
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def pack_signature(signature):
+    return array('I', signature).tobytes()
+
+def unpack_signature(data):
+    return tuple(array('I', data))
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERM
+
+def _band_keys(signature):
+    # One integer per band: the band number in the high bits, a hash of its rows below
+    return [
+        (band << 32) | zlib.crc32(array('I', signature[band * ROWS:(band + 1) * ROWS]).tobytes())
+        for band in range(BANDS)
+    ]
+
+class DuplicateIndex:
+    """LSH index over the comment_band table; every method works in the caller's transaction."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def add(self, comment_id, signature):
+        """Index a flushed comment's signature. Does not commit."""
+        if signature is None:
+            return
+        db.session.execute(
+            db.insert(CommentBand),
+            [{'comment_id': comment_id, 'band': band, 'band_key': key}
+             for band, key in enumerate(_band_keys(signature))]
+        )
+
+    def remove(self, comment_id):
+        """Drop a comment from the index before it is deleted. Does not commit."""
+        db.session.execute(
+            db.delete(CommentBand).where(CommentBand.comment_id == comment_id),
+            execution_options={'synchronize_session': False}
+        )
+
+    def remove_post(self, post_id):
+        """Drop every comment of a post from the index before the post is deleted. Does not commit."""
+        db.session.execute(
+            db.delete(CommentBand).where(
+                CommentBand.comment_id.in_(db.select(Comment.id).where(Comment.post_id == post_id))
+            ),
+            execution_options={'synchronize_session': False}
+        )
+
+    def find(self, signature, post_id):
+        """Return (comment_id, similarity, same_post) of the closest earlier comment above
+        the threshold, or None. Comments on the same post win ties."""
+        if signature is None:
+            return None
+        candidates = db.session.execute(
+            db.select(Comment.id, Comment.post_id, Comment.minhash)
+            .where(Comment.id.in_(
+                db.select(CommentBand.comment_id).where(CommentBand.band_key.in_(_band_keys(signature)))
+            ))
+        )
+        best = None
+        for comment_id, other_post_id, data in candidates:
+            score = similarity(signature, unpack_signature(data))
+            if score < self.threshold:
+                continue
+            match = (comment_id, score, other_post_id == post_id)
+            if best is None or (score, match[2]) > (best[1], best[2]):
+                best = match
+        return best
+
+def rebuild_signatures(chunk_size=1000, recompute=False):
+    """Compute Comment.minhash for existing comments in id order; returns the number updated."""
+    updated = 0
+    last_id = 0
+    while True:
+        query = db.select(Comment.id, Comment.content).where(Comment.id > last_id)
+        if not recompute:
+            query = query.where(Comment.minhash.is_(None))
+        rows = db.session.execute(query.order_by(Comment.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        signatures = [(comment_id, minhash(content)) for comment_id, content in rows]
+        # One executemany UPDATE by primary key per chunk
+        db.session.execute(db.update(Comment), [
+            {'id': comment_id, 'minhash': pack_signature(signature) if signature else None}
+            for comment_id, signature in signatures
+        ])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1][0]
+    return updated
+
+def rebuild_bands(chunk_size=1000, missing_only=False):
+    """Refill comment_band from the stored signatures, chunk_size comments at a time. Returns the number indexed.
+
+    With missing_only, existing bands are kept and only comments without any
+    are added (e.g. after a bulk load).
+    """
+    if not missing_only:
+        db.session.execute(db.delete(CommentBand), execution_options={'synchronize_session': False})
+    indexed, last_id = 0, 0
+    while True:
+        query = db.select(Comment.id, Comment.minhash).where(Comment.id > last_id, Comment.minhash.isnot(None))
+        if missing_only:
+            query = query.where(~db.exists().where(CommentBand.comment_id == Comment.id))
+        rows = db.session.execute(query.order_by(Comment.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        db.session.execute(db.insert(CommentBand), [
+            {'comment_id': comment_id, 'band': band, 'band_key': key}
+            for comment_id, data in rows
+            for band, key in enumerate(_band_keys(unpack_signature(data)))
+        ])
+        db.session.commit()
+        indexed += len(rows)
+        last_id = rows[-1][0]
+    db.session.commit()
+    return indexed
+
+def init_duplicates(app):
+    app.extensions['duplicate_index'] = DuplicateIndex(Config.DUPLICATE_THRESHOLD)
+
+def get_duplicate_index():
+    return current_app.extensions['duplicate_index']
@@ -0,0 +1,378 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Comment
+from config import Config
+from evaluation_cache import EvaluationCache, evaluation_key
+from evaluation_log import init_evaluation_log, log_event, debug_enabled
+from llm_client import get_llm_client, call_stats
+from prompt_context import build_user_prompt, post_contexts
+from counters import touch_post, add_points
+from trending import record_heat
+
+# AI comment evaluation. Comments are stored as 'pending' by add_comment and
+# scored here on a small pool of background threads, so a slow LLM call never
+# holds a request thread. The worker writes ai_score/ai_feedback and awards
+# the comment's quality points once the score is known. Each evaluation
+# produces a single structured record in the evaluation log.
+#
+# The queue lives in memory, so a sweep thread periodically re-queues
+# comments that have been pending for longer than EVALUATION_STALE_AFTER:
+# those lost to a restart or a deploy, or turned away by a full queue. A
+# comment queued twice (e.g. by two processes) is still paid only once, see
+# process(). Retries live in one place, the LLM client (llm_client.py); any
+# error that reaches the queue falls back to length-based scoring at once.
+
+# Bump whenever SYSTEM_PROMPT or the prompt layout changes, so cached
+# evaluations made with the old prompt are no longer used.
+PROMPT_VERSION = 2
+
+SYSTEM_PROMPT = """You are an expert literary critic and community moderator for a Romanian literary platform.
+Your task is to evaluate comments on literary works based on:
+1. Relevance to the original post
+2. Literary insight and value
+3. Constructive feedback
+4. Thoughtfulness and depth
+5. Appropriate tone and language
+
+Rate the comment on a scale of 0-100, where:
+0-20: Spam, irrelevant, or inappropriate
+21-40: Minimal effort, generic, or superficial
+41-60: Adequate but lacks depth or insight
+61-80: Good quality with relevant insights
+81-100: Exceptional literary analysis with depth and originality
+
+Also determine if the comment is spam or copied content (yes/no).
+
+Provide your evaluation in JSON format:
+{
+  "score": [0-100],
+  "is_spam_or_copied": [true/false],
+  "reasoning": "[brief explanation of your evaluation]"
+}"""
+
+SPAM_PATTERNS = [
+    'http://', 'https://', 'www.', '.com', '.net', '.org',  # URLs
+    'viagra', 'cialis', 'buy now', 'discount', 'free offer',  # Common spam words
+    'casino', 'lottery', 'winner', 'prize', 'money',  # More spam words
+]
+
+def request_evaluation(content, post_type, post_content=None, post_title=None, context=None):
+    """Evaluate comment using OpenAI model; raises if the API call fails.
+
+    context is the post's PreparedContext when the caller already has it.
+    """
+    # Check if comment contains spam patterns (quick check before API call)
+    if any(pattern in content.lower() for pattern in SPAM_PATTERNS):
+        return 0, True, "Comment contains spam patterns"
+
+    # Post context (type, title, bounded excerpt) is cached per post
+    user_prompt, _ = build_user_prompt(content, post_type, post_content, post_title, context)
+
+    if debug_enabled():
+        log_event('prompt', logging.DEBUG, system_prompt=SYSTEM_PROMPT, user_prompt=user_prompt)
+
+    # Call OpenAI API through the shared, pooled client
+    response_content = get_llm_client(current_app).complete(
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        response_format={"type": "json_object"}
+    )
+
+    # Parse the JSON response
+    if debug_enabled():
+        log_event('response', logging.DEBUG, response=response_content)
+    evaluation = json.loads(response_content)
+
+    score = int(evaluation.get("score", 0))
+    is_spam_copied = evaluation.get("is_spam_or_copied", False)
+    reasoning = evaluation.get("reasoning", "No reasoning provided")
+
+    # Return the score, whether it's spam or copied, and the reasoning
+    return score, is_spam_copied, reasoning
+
+def evaluate_comment_with_openai(content, post_type, post_content=None, post_title=None, context=None):
+    """Evaluate comment using OpenAI model, returning a zero score on errors."""
+    try:
+        return request_evaluation(content, post_type, post_content, post_title, context)
+    except Exception as e:
+        log_event('evaluation_error', logging.ERROR, error=repr(e))
+        logging.error(f"OpenAI evaluation error: {e}")
+        return 0, False, "Error evaluating comment"
+
+def evaluate_comment(content, post_type):
+    """Evaluate comment using OpenAI API."""
+    # This is a legacy function that doesn't include post context
+    # It should return three values to match the new signature
+    score, is_spam_copied, reasoning = evaluate_comment_with_openai(content, post_type)
+    return score, is_spam_copied, reasoning
+
+def stub_evaluator(content, post_type, post_content=None, post_title=None, context=None):
+    """Offline evaluator for development and tests: scores by word count, no network."""
+    if any(pattern in content.lower() for pattern in SPAM_PATTERNS):
+        return 0, True, "Comment contains spam patterns"
+    word_count = len(content.split())
+    return min(100, 10 + word_count * 2), False, f"Stub evaluation ({word_count} words)"
+
+EVALUATORS = {
+    'openai': request_evaluation,
+    'stub': stub_evaluator,
+}
+
+def apply_length_minimums(score, content):
+    """Set minimum scores based on comment length (used when the AI score is missing or low)."""
+    # Calculate comment length in words
+    word_count = len(content.split())
+
+    # If the AI evaluation failed or returned 0, set a minimum score based on length
+    if score == 0:
+        if word_count > 200:  # Very long, detailed comment
+            score = 80
+        elif word_count > 100:  # Long comment
+            score = 60
+        elif word_count > 50:  # Medium comment
+            score = 40
+        elif word_count > 20:  # Short but substantial comment
+            score = 20
+        else:  # Very short comment
+            score = 10
+
+    # Ensure minimum scores based on length even if AI gave a lower score
+    if word_count > 200 and score < 60:
+        score = 60
+    elif word_count > 100 and score < 40:
+        score = 40
+    elif word_count > 50 and score < 20:
+        score = 20
+
+    return score
+
+def points_for_score(score, is_spam_copied=False):
+    """Points awarded for a comment with the given AI score."""
+    if not score or is_spam_copied:
+        return 0
+    if score <= Config.COMMENT_QUALITY_THRESHOLDS['low']:
+        return Config.COMMENT_QUALITY_REWARDS['low']
+    if score <= Config.COMMENT_QUALITY_THRESHOLDS['medium']:
+        return Config.COMMENT_QUALITY_REWARDS['medium']
+    return Config.COMMENT_QUALITY_REWARDS['high']
+
+def settle_evaluation(result, content, event):
+    """Turn an evaluator result (or None after a failure) into (final score, reasoning, points)."""
+    if result is None:
+        # Out of retries: fall back to length-based scoring
+        event['fallback'] = True
+        result = (0, False, "Error evaluating comment")
+    score, is_spam_copied, reasoning = result
+    event.update(ai_score=score, is_spam_copied=is_spam_copied)
+
+    if is_spam_copied:
+        score = 0
+    else:
+        score = apply_length_minimums(score, content)
+
+    points_awarded = points_for_score(score, is_spam_copied)
+    event.update(final_score=int(score), points_awarded=points_awarded)
+    return int(score), reasoning, points_awarded
+
+class EvaluationQueue:
+    """Bounded job queue of comment ids, served by a fixed pool of worker threads."""
+
+    def __init__(self, app, evaluator, workers, maxsize, cache, stale_after, sweep_interval):
+        self.app = app
+        self.evaluator = evaluator
+        self.cache = cache
+        self.workers = workers
+        self.stale_after = stale_after
+        self.sweep_interval = sweep_interval
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self._queued = set()  # Comment ids waiting in or taken from jobs, not yet processed
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads are started on first use so they live in the gunicorn worker
+        # process rather than in a parent that forks.
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'comment-evaluator-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if self.sweep_interval:
+                thread = threading.Thread(target=self._sweep, name='comment-evaluation-sweep', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, comment_id):
+        """Queue a comment for evaluation. Returns False if the queue is full."""
+        self._ensure_started()
+        with self._lock:
+            if comment_id in self._queued:
+                return True
+            try:
+                self.jobs.put_nowait(comment_id)
+            except queue.Full:
+                logging.warning(f"Evaluation queue full, comment {comment_id} left pending")
+                return False
+            self._queued.add(comment_id)
+            return True
+
+    def requeue_stale(self):
+        """Submit comments pending for longer than stale_after, as many as the queue has room for.
+
+        Returns the number submitted. Needs an app context.
+        """
+        room = self.jobs.maxsize - self.jobs.qsize()
+        if room <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        comment_ids = db.session.scalars(
+            db.select(Comment.id)
+            .where(Comment.evaluation_status == 'pending', Comment.created_at < cutoff)
+            .order_by(Comment.created_at)
+            .limit(room)
+        ).all()
+        return sum(1 for comment_id in comment_ids if self.submit(comment_id))
+
+    def join(self):
+        """Block until every queued comment has been processed."""
+        self.jobs.join()
+
+    def _run(self):
+        while True:
+            comment_id = self.jobs.get()
+            try:
+                with self.app.app_context():
+                    self.process(comment_id)
+            except Exception as e:
+                logging.error(f"Error evaluating comment {comment_id}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._queued.discard(comment_id)
+                self.jobs.task_done()
+
+    def _sweep(self):
+        # First sweep right away: picks up what a restart or deploy left pending
+        while True:
+            try:
+                with self.app.app_context():
+                    requeued = self.requeue_stale()
+                if requeued:
+                    logging.info(f"Re-queued {requeued} stale pending comments")
+            except Exception as e:
+                logging.error(f"Error re-queueing pending comments: {str(e)}")
+            time.sleep(self.sweep_interval)
+
+    def evaluate(self, content, post_id, post_type, post_content, post_title, event, evaluator=None):
+        """Return the evaluator's (score, is_spam_copied, reasoning), or None if it failed.
+
+        Goes through the evaluation cache and records the cache outcome and
+        any error in the event dict. Not retried here: the LLM client already
+        retries transient failures within its deadline. Needs an app context.
+        """
+        evaluator = evaluator or self.evaluator
+        version = f'{PROMPT_VERSION}:{getattr(evaluator, "__name__", "evaluator")}'
+        key = evaluation_key(content, post_id, version)
+        cached = self.cache.get(key)
+        event['cache'] = 'hit' if cached is not None else 'miss'
+        if cached is not None:
+            return cached
+
+        context = post_contexts.prepare(post_type, post_title, post_content)
+        event.update(
+            prompt_tokens=context.prefix_tokens,
+            prompt_tokens_saved=context.full_tokens - context.prefix_tokens
+        )
+        try:
+            with call_stats(event):
+                result = evaluator(
+                    content=content,
+                    post_type=post_type,
+                    post_content=post_content,
+                    post_title=post_title,
+                    context=context
+                )
+        except Exception as e:
+            # Out of client retries, circuit open or a bad response: use the fallback score
+            event['evaluator_error'] = repr(e)
+            return None
+        self.cache.put(key, result)
+        return result
+
+    def process(self, comment_id):
+        """Score a pending comment and settle its points. Must run in an app context."""
+        comment = db.session.get(Comment, comment_id)
+        if comment is None or comment.evaluation_status != 'pending':
+            return
+
+        # Read up front: the comment may be deleted while it is being evaluated
+        content, user_id, created_at = comment.content, comment.user_id, comment.created_at
+        post = comment.post
+        post_id, post_type, post_content, post_title = post.id, post.post_type, post.content, post.title
+
+        started = time.perf_counter()
+        event = {'comment_id': comment_id, 'post_id': post_id, 'words': len(content.split())}
+        if debug_enabled():
+            event['content'] = content
+
+        result = self.evaluate(content, post_id, post_type, post_content, post_title, event)
+        score, reasoning, points_awarded = settle_evaluation(result, content, event)
+
+        # Only a comment that is still pending is scored and paid: if it was
+        # deleted meanwhile (see posts.delete_comment) no row matches
+        scored = db.session.execute(
+            db.update(Comment)
+            .where(Comment.id == comment_id, Comment.evaluation_status == 'pending')
+            .values(ai_score=score, ai_feedback=reasoning, evaluation_status='done'),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if scored:
+            touch_post(post)
+            record_heat(post, Config.TRENDING_QUALITY_WEIGHT * score / 100, created_at)
+            add_points(user_id, points_awarded, 'comment_scored', comment_id)
+        else:
+            event['skipped'] = 'no longer pending'
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            event['error'] = repr(e)
+            raise
+        finally:
+            event['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            log_event('comment_evaluated', logging.WARNING if event.get('fallback') else logging.INFO, **event)
+
+def init_evaluation(app):
+    """Create the evaluation queue for this app."""
+    init_evaluation_log(app)
+    evaluator = app.config.get('COMMENT_EVALUATOR', 'openai')
+    if not callable(evaluator):
+        evaluator = EVALUATORS[evaluator]
+    app.extensions['evaluation_queue'] = EvaluationQueue(
+        app,
+        evaluator,
+        workers=Config.EVALUATION_WORKERS,
+        maxsize=Config.EVALUATION_QUEUE_SIZE,
+        cache=EvaluationCache(Config.EVALUATION_CACHE_SIZE, Config.EVALUATION_CACHE_TTL),
+        stale_after=Config.EVALUATION_STALE_AFTER,
+        sweep_interval=app.config.get('EVALUATION_SWEEP_INTERVAL', Config.EVALUATION_SWEEP_INTERVAL)
+    )
+
+    @app.before_request
+    def _start_evaluation_workers():
+        # Start the workers (and the sweep) with the first request, not the first comment
+        app.extensions['evaluation_queue']._ensure_started()
+
+def get_evaluation_queue():
+    return current_app.extensions['evaluation_queue']
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import db, CachedEvaluation
+
+# Content-addressed cache of AI evaluations. Entries are keyed by a hash of the
+# normalized comment text, the post id and the prompt version, so resubmitted
+# or re-scored comments skip the LLM call. Lookups go to an in-process LRU
+# first and then to the evaluation_cache table, which survives restarts.
+# Entries expire after a TTL; `flask prune-evaluation-cache` deletes them.
+
+_whitespace = re.compile(r'\s+')
+
+def normalize_comment(content):
+    """Fold case, Unicode form and whitespace so trivial edits hash the same."""
+    content = unicodedata.normalize('NFC', content).casefold()
+    return _whitespace.sub(' ', content).strip()
+
+def evaluation_key(content, post_id, prompt_version):
+    """Cache key for one (comment text, post, prompt version) triple."""
+    material = f'{prompt_version}\x00{post_id}\x00{normalize_comment(content)}'
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class EvaluationCache:
+    """Two-tier (memory LRU + database) cache of (score, is_spam_copied, reasoning)."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, result, expires_at):
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached result for key, or None. Needs an app context on a memory miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+        row = db.session.get(CachedEvaluation, key)
+        age = (datetime.utcnow() - row.created_at).total_seconds() if row is not None else None
+        if age is None or age >= self.ttl:
+            # Expired rows are replaced by put() and deleted by prune_evaluation_cache()
+            with self._lock:
+                self.misses += 1
+            return None
+
+        result = (row.score, row.is_spam_copied, row.reasoning)
+        self._remember(key, result, time.monotonic() + self.ttl - age)
+        with self._lock:
+            self.db_hits += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result in both tiers. The row is flushed in a savepoint; the caller commits."""
+        self._remember(key, result, time.monotonic() + self.ttl)
+        score, is_spam_copied, reasoning = result
+        # An expired entry under the same key is replaced
+        db.session.execute(
+            db.delete(CachedEvaluation).where(CachedEvaluation.key == key, CachedEvaluation.created_at < _cutoff(self.ttl)),
+            execution_options={'synchronize_session': False}
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(CachedEvaluation(
+                    key=key, score=score, is_spam_copied=bool(is_spam_copied), reasoning=reasoning
+                ))
+        except IntegrityError as e:
+            # Another worker stored the same key first
+            logging.info(f"Evaluation cache entry {key[:12]} not stored: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.maxsize,
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+            }
+
+def _cutoff(ttl):
+    return datetime.utcnow() - timedelta(seconds=ttl)
+
+def prune_evaluation_cache(ttl):
+    """Delete database cache entries older than ttl seconds. Returns the number deleted."""
+    return db.session.execute(
+        db.delete(CachedEvaluation).where(CachedEvaluation.created_at < _cutoff(ttl)),
+        execution_options={'synchronize_session': False}
+    ).rowcount
@@ -0,0 +1,61 @@
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config import Config
+
+# Structured log of AI comment evaluations. Callers only put records on an
+# in-memory queue; a single QueueListener thread formats them as JSON lines
+# and writes them to a size-rotated file, so request and worker threads never
+# touch the file. Prompt bodies are only logged at DEBUG level.
+
+logger = logging.getLogger('scrisurinoi.evaluation')
+logger.propagate = False
+
+_listener = None
+
+class JsonLineFormatter(logging.Formatter):
+    """Format a record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'event': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def init_evaluation_log(app):
+    """Start the background writer for the evaluation log (once per process)."""
+    global _listener
+    level = logging.getLevelName(app.config.get('EVALUATION_LOG_LEVEL', 'INFO').upper())
+    logger.setLevel(level)
+    if _listener is not None:
+        return
+
+    file_handler = RotatingFileHandler(
+        app.config.get('EVALUATION_LOG_FILE', Config.EVALUATION_LOG_FILE),
+        maxBytes=Config.EVALUATION_LOG_MAX_BYTES,
+        backupCount=Config.EVALUATION_LOG_BACKUPS,
+        encoding='utf-8',
+        delay=True
+    )
+    file_handler.setFormatter(JsonLineFormatter())
+
+    records = queue.Queue(-1)
+    logger.addHandler(QueueHandler(records))
+    _listener = QueueListener(records, file_handler, respect_handler_level=False)
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(_listener.stop)
+
+def log_event(event, level=logging.INFO, **fields):
+    """Queue one structured record for the evaluation log."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+def debug_enabled():
+    return logger.isEnabledFor(logging.DEBUG)
@@ -0,0 +1,217 @@
+import hashlib
+from datetime import datetime
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from models import db, Post, FeedGeneration, post_revision, random_shuffle_key, SHUFFLE_KEY_SPACE
+from config import Config
+
+# Keyset ("cursor") pagination for the post feed. Every sort mode orders by a
+# key column plus Post.id as a tie-breaker, and the cursor stores the last
+# (key, id) pair that was shown, so fetching page N costs the same as page 1.
+#
+# The random sort walks Post.shuffle_key, a random number stored with every
+# post and indexed together with post_type, instead of sorting the table by
+# random() or a computed key on every request. Each visit starts at a random
+# point of the key space, runs down to the bottom and wraps around to the
+# top, so a page is an index range scan whatever the table size, and the
+# cursor (start, last key, wrapped) never repeats a post within a visit.
+# `flask reshuffle-posts` draws new keys to vary the order over time.
+#
+# Feed ETags are built per page by feed_page_tag(): the same page query, but
+# selecting only the id, revision and sort-key columns of its rows, so a
+# conditional GET skips loading post bodies and authors, and a like only
+# changes the tags of the pages that show the liked post. The feed_generation
+# row is a site-wide marker for changes the page rows cannot show (created and
+# deleted posts, a trending recompute, a reshuffle); it only feeds
+# Last-Modified and is never written by likes or comments.
+
+SORT_MODES = ('recent', 'likes', 'comments', 'trending', 'random')
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='feed-cursor')
+
+def encode_cursor(state):
+    """Sign the cursor state so it can be handed to the client."""
+    return _serializer().dumps(state)
+
+def decode_cursor(token):
+    """Return the cursor state for a token, raising ValueError if it is invalid."""
+    try:
+        return _serializer().loads(token)
+    except BadSignature:
+        raise ValueError('Invalid cursor')
+
+def _sort_key(sort):
+    if sort == 'likes':
+        return Post.like_count
+    if sort == 'comments':
+        return Post.comment_count
+    if sort == 'trending':
+        return Post.hot_score
+    if sort == 'random':
+        return Post.shuffle_key
+    return Post.created_at
+
+def _key_value(post, sort):
+    if sort == 'likes':
+        return post.like_count
+    if sort == 'comments':
+        return post.comment_count
+    if sort == 'trending':
+        return post.hot_score
+    if sort == 'random':
+        return post.shuffle_key
+    return post.created_at.isoformat()
+
+def _after(key, last_key, last_id):
+    # Rows after (last_key, last_id) in descending (key, id) order. The
+    # redundant key <= last_key keeps this one index range: with a lower
+    # bound as well (the random sort's wrapped segment) SQLite otherwise may
+    # split the OR into two index searches and sort their union.
+    return db.and_(key <= last_key, db.or_(key < last_key, db.and_(key == last_key, Post.id < last_id)))
+
+def _page_args(sort, cursor, per_page):
+    if sort not in SORT_MODES:
+        sort = 'recent'
+    per_page = max(1, min(per_page or Config.FEED_PAGE_SIZE, Config.FEED_MAX_PAGE_SIZE))
+    state = decode_cursor(cursor) if cursor else None
+    if state and state.get('sort') != sort:
+        raise ValueError('Cursor does not match the requested sort')
+    return sort, state, per_page
+
+def paginate_feed(post_type=None, sort='recent', cursor=None, per_page=None):
+    """Return (posts, next_cursor) for one page of the feed.
+
+    next_cursor is None when there are no more posts.
+    """
+    sort, state, per_page = _page_args(sort, cursor, per_page)
+    query = Post.query.options(
+        db.defer(Post.content),
+        db.undefer(Post.excerpt),
+        db.selectinload(Post.author)
+    )
+    return _page(query, post_type, sort, state, per_page)
+
+def feed_page_tag(post_type=None, sort='recent', cursor=None, per_page=None):
+    """(tag, last change) of the page paginate_feed() would return, from key columns only.
+
+    The tag changes when a post on the page is re-rendered, the page shows
+    other posts or its next cursor moves. Raises ValueError like paginate_feed().
+    """
+    sort, state, per_page = _page_args(sort, cursor, per_page)
+    query = db.session.query(
+        Post.id, Post.created_at, Post.version, Post.updated_at,
+        Post.like_count, Post.comment_count, Post.hot_score, Post.shuffle_key
+    )
+    rows, next_cursor = _page(query, post_type, sort, state, per_page)
+    marker = feed_state()
+    tag = hashlib.sha1(repr((
+        [(post_revision(row.id, row.created_at, row.version), _key_value(row, sort)) for row in rows],
+        next_cursor
+    )).encode('utf-8')).hexdigest()
+    changes = [row.updated_at for row in rows if row.updated_at]
+    if marker and marker[1]:
+        changes.append(marker[1])
+    return tag, max(changes, default=None)
+
+def _page(query, post_type, sort, state, per_page):
+    # query selects Post entities or Post columns; rows of both have the attributes used here
+    if post_type:
+        query = query.filter(Post.post_type == post_type)
+
+    if sort == 'random':
+        return _random_page(query, state, per_page)
+
+    key = _sort_key(sort)
+    if state:
+        last_key = state['key']
+        if sort == 'recent':
+            last_key = datetime.fromisoformat(last_key)
+        query = query.filter(_after(key, last_key, state['id']))
+
+    # Fetch one extra row to know whether there is a next page
+    posts = query.order_by(key.desc(), Post.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(posts) > per_page:
+        posts = posts[:per_page]
+        last = posts[-1]
+        next_cursor = encode_cursor({
+            'sort': sort,
+            'key': _key_value(last, sort),
+            'id': last.id
+        })
+    return posts, next_cursor
+
+def _random_page(query, state, per_page):
+    # Segment one: keys <= start, going down. Segment two (wrapped): keys > start.
+    if state and 'start' not in state:
+        raise ValueError('Invalid cursor')  # Issued before the random sort used shuffle keys
+    start = state['start'] if state else random_shuffle_key()
+    wrapped = bool(state and state['wrapped'])
+    key = Post.shuffle_key
+    order = (key.desc(), Post.id.desc())
+
+    segment = query.filter(key > start if wrapped else key <= start)
+    if state and 'key' in state:
+        segment = segment.filter(_after(key, state['key'], state['id']))
+    posts = segment.order_by(*order).limit(per_page + 1).all()
+    if len(posts) <= per_page and not wrapped:
+        # Bottom of the key space reached: continue from the top
+        posts += query.filter(key > start).order_by(*order).limit(per_page + 1 - len(posts)).all()
+
+    next_cursor = None
+    if len(posts) > per_page:
+        posts = posts[:per_page]
+        last = posts[-1]
+        next_cursor = encode_cursor({
+            'sort': 'random',
+            'start': start,
+            'wrapped': last.shuffle_key > start,
+            'key': last.shuffle_key,
+            'id': last.id
+        })
+    return posts, next_cursor
+
+FEED_GENERATION_ID = 1
+
+def feed_state():
+    """(generation, last change) of the site-wide feed marker, or None if its row is missing."""
+    row = db.session.execute(
+        db.select(FeedGeneration.generation, FeedGeneration.updated_at)
+        .where(FeedGeneration.id == FEED_GENERATION_ID)
+    ).first()
+    return tuple(row) if row else None
+
+def bump_feed_generation():
+    """Advance the site-wide feed marker (post created or deleted, feed order redrawn). Does not commit.
+
+    Every caller locks the same row, so this is for rare writes only, never
+    for likes, comments or other counter changes.
+    """
+    db.session.execute(
+        db.update(FeedGeneration)
+        .where(FeedGeneration.id == FEED_GENERATION_ID)
+        .values(generation=FeedGeneration.generation + 1, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+
+def ensure_feed_generation():
+    """Create the feed_generation row if it does not exist yet (fresh databases)."""
+    if db.session.get(FeedGeneration, FEED_GENERATION_ID) is None:
+        db.session.add(FeedGeneration(id=FEED_GENERATION_ID))
+        db.session.commit()
+
+def reshuffle_posts():
+    """Draw a new shuffle key for every post in one UPDATE and bump the feed generation. Does not commit."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        key = db.cast(db.func.floor(db.func.random() * SHUFFLE_KEY_SPACE), db.Integer)
+    else:
+        key = db.func.abs(db.func.random()) % SHUFFLE_KEY_SPACE  # SQLite: random() is a signed 64-bit integer
+    updated = db.session.execute(
+        db.update(Post).values(shuffle_key=key),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    bump_feed_generation()
+    return updated
@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+from flask import current_app
+from markupsafe import Markup
+from models import db, Comment
+from config import Config
+
+# Cache of rendered HTML fragments: the post card on the feed, and the post
+# body and comment list on the post page. Keys are Post.revision: the post id,
+# its creation time (SQLite reuses a deleted post's id) and Post.version, which
+# counters.py bumps on every like, comment, evaluation and author rename, so a
+# changed post is simply looked up under a new key and the stale entry ages
+# out. Fragments are rendered without the request's user, so one copy serves
+# every visitor. The backend is in-process LRU by default, or Redis (shared by
+# all gunicorn workers) when FRAGMENT_CACHE_URL is set.
+
+# Bump when the fragment templates change so a shared backend drops old markup
+TEMPLATE_VERSION = 3
+
+FRAGMENT_TEMPLATES = {
+    'card': 'posts/_card.html',
+    'body': 'posts/_body.html',
+    'comments': 'posts/_comments.html'
+}
+
+def _load_comments(post):
+    # Newest first, with every author fetched in one extra SELECT ... IN
+    comments = db.session.scalars(
+        db.select(Comment)
+        .options(db.selectinload(Comment.author))
+        .where(Comment.post_id == post.id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+    ).all()
+    return {'comments': comments}
+
+# Extra template context, only loaded when a fragment has to be rendered
+FRAGMENT_LOADERS = {
+    'comments': _load_comments
+}
+
+class MemoryBackend:
+    """Thread-safe in-process LRU."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """Redis-backed store shared across processes.
+
+    Eviction is left to Redis (TTL plus an allkeys-lru maxmemory policy).
+    """
+
+    def __init__(self, url, prefix='fragment:'):
+        import redis  # Optional dependency, only needed when FRAGMENT_CACHE_URL is set
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value.encode('utf-8'), ex=ttl)
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+    def size(self):
+        return None
+
+class FragmentCache:
+    """Render-or-fetch for post fragments, with per-kind hit counters."""
+
+    def __init__(self, backend, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = {kind: 0 for kind in FRAGMENT_TEMPLATES}
+        self.misses = {kind: 0 for kind in FRAGMENT_TEMPLATES}
+
+    def render(self, kind, post):
+        key = f'{TEMPLATE_VERSION}:{kind}:{post.revision}'
+        try:
+            html = self.backend.get(key)
+        except Exception as e:
+            # A cache outage must not take the page down with it
+            current_app.logger.warning(f"Fragment cache read failed: {e}")
+            html = None
+
+        with self._lock:
+            if html is not None:
+                self.hits[kind] += 1
+            else:
+                self.misses[kind] += 1
+        if html is not None:
+            return Markup(html)
+
+        # Rendered straight from the Jinja environment rather than with
+        # render_template, so context processors (current_user) are not
+        # available and nothing user-specific can leak into a shared fragment
+        loader = FRAGMENT_LOADERS.get(kind)
+        context = loader(post) if loader else {}
+        html = current_app.jinja_env.get_template(FRAGMENT_TEMPLATES[kind]).render(post=post, **context)
+        try:
+            self.backend.set(key, html, self.ttl)
+        except Exception as e:
+            current_app.logger.warning(f"Fragment cache write failed: {e}")
+        return Markup(html)
+
+    def stats(self):
+        with self._lock:
+            kinds = {}
+            for kind in FRAGMENT_TEMPLATES:
+                lookups = self.hits[kind] + self.misses[kind]
+                kinds[kind] = {
+                    'hits': self.hits[kind],
+                    'misses': self.misses[kind],
+                    'hit_ratio': self.hits[kind] / lookups if lookups else 0.0
+                }
+            hits = sum(self.hits.values())
+            lookups = hits + sum(self.misses.values())
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'fragments': kinds
+        }
+
+def init_fragments(app):
+    url = app.config.get('FRAGMENT_CACHE_URL')
+    backend = RedisBackend(url) if url else MemoryBackend(Config.FRAGMENT_CACHE_SIZE)
+    cache = FragmentCache(backend, ttl=Config.FRAGMENT_CACHE_TTL)
+    app.extensions['fragment_cache'] = cache
+    app.jinja_env.globals['fragment'] = cache.render
+
+def get_fragment_cache():
+    return current_app.extensions['fragment_cache']
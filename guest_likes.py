@@ -0,0 +1,171 @@
+import atexit
+import logging
+import threading
+from flask import current_app
+from models import db, User, Post, Comment
+from config import Config
+from counters import touch_posts
+from ledger import record_points_many
+
+# Write-behind buffer for guest likes. A guest like only adds to the
+# target's guest_like_count and to its author's points, so instead of one
+# commit per click (which serializes a viral post's traffic on the author's
+# user row) the increments are summed in memory and written by a background
+# thread: one executemany UPDATE per table for everything that arrived since
+# the last flush. A flush happens every GUEST_LIKE_FLUSH_INTERVAL seconds, as
+# soon as GUEST_LIKE_FLUSH_SIZE likes are waiting, and at shutdown. Buffers
+# are per process; with several gunicorn workers each flushes its own share,
+# which is fine because the updates are additive.
+
+class GuestLikeBuffer:
+    """Coalesces guest likes per post, comment and author until the next flush."""
+
+    def __init__(self, app, interval, max_pending):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._reset()
+        self.flushed = 0
+        self.flushes = 0
+
+    def _reset(self):
+        self._posts = {}
+        self._comments = {}
+        self._points = {}
+        self._touched = set()  # Posts whose rendering changes
+        self.pending = 0
+
+    def _ensure_started(self):
+        # Started on first use so the thread lives in the gunicorn worker, not a forking parent
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='guest-like-flusher', daemon=True)
+            self._thread.start()
+
+    def add_post_like(self, post):
+        """Buffer a guest like on a post."""
+        self._add(self._posts, post.id, post.id, post.user_id, Config.POST_LIKE_REWARD)
+
+    def add_comment_like(self, comment):
+        """Buffer a guest like on a comment."""
+        self._add(self._comments, comment.id, comment.post_id, comment.user_id, Config.COMMENT_LIKE_REWARD)
+
+    def _add(self, counts, target_id, post_id, author_id, reward):
+        with self._lock:
+            if not self._stopping:
+                self._ensure_started()
+            counts[target_id] = counts.get(target_id, 0) + 1
+            self._points[author_id] = self._points.get(author_id, 0) + reward
+            self._touched.add(post_id)
+            self.pending += 1
+            full = self.pending >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def pending_for_post(self, post_id):
+        with self._lock:
+            return self._posts.get(post_id, 0)
+
+    def pending_for_comment(self, comment_id):
+        with self._lock:
+            return self._comments.get(comment_id, 0)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing guest likes: {str(e)}")
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of likes written."""
+        with self._lock:
+            posts, comments, points, touched, pending = (
+                self._posts, self._comments, self._points, self._touched, self.pending
+            )
+            self._reset()
+        if not pending:
+            return 0
+
+        try:
+            with self.app.app_context():
+                _write(posts, comments, points, touched)
+        except Exception:
+            # Put the increments back so they go out with the next flush
+            with self._lock:
+                for mine, theirs in ((self._posts, posts), (self._comments, comments), (self._points, points)):
+                    for key, value in theirs.items():
+                        mine[key] = mine.get(key, 0) + value
+                self._touched |= touched
+                self.pending += pending
+            raise
+
+        with self._lock:
+            self.flushed += pending
+            self.flushes += 1
+        return pending
+
+    def close(self):
+        """Stop the flusher thread and write what is left."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Error flushing guest likes at shutdown: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {'pending': self.pending, 'flushed': self.flushed, 'flushes': self.flushes}
+
+def _write(posts, comments, points, touched):
+    options = {'synchronize_session': False}
+    posts_table, comments_table, users_table = Post.__table__, Comment.__table__, User.__table__
+    try:
+        if posts:
+            db.session.execute(
+                posts_table.update()
+                .where(posts_table.c.id == db.bindparam('target'))
+                .values(guest_like_count=posts_table.c.guest_like_count + db.bindparam('likes')),
+                [{'target': post_id, 'likes': likes} for post_id, likes in posts.items()],
+                execution_options=options
+            )
+        if comments:
+            db.session.execute(
+                comments_table.update()
+                .where(comments_table.c.id == db.bindparam('target'))
+                .values(guest_like_count=comments_table.c.guest_like_count + db.bindparam('likes')),
+                [{'target': comment_id, 'likes': likes} for comment_id, likes in comments.items()],
+                execution_options=options
+            )
+        db.session.execute(
+            users_table.update()
+            .where(users_table.c.id == db.bindparam('uid'))
+            .values(points=users_table.c.points + db.bindparam('delta')),
+            [{'uid': user_id, 'delta': delta} for user_id, delta in points.items()],
+            execution_options=options
+        )
+        # One ledger event per author and flush, not per click
+        record_points_many([
+            {'user_id': user_id, 'delta': delta, 'reason': 'guest_likes'} for user_id, delta in points.items()
+        ])
+        touch_posts(touched)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def init_guest_likes(app):
+    buffer = GuestLikeBuffer(app, Config.GUEST_LIKE_FLUSH_INTERVAL, Config.GUEST_LIKE_FLUSH_SIZE)
+    app.extensions['guest_likes'] = buffer
+    atexit.register(buffer.close)
+
+def get_guest_likes():
+    return current_app.extensions['guest_likes']
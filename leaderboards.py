@@ -0,0 +1,202 @@
+import heapq
+import logging
+import threading
+import time
+from flask import current_app
+from models import db, User, Post, Comment, PointsEvent
+from config import Config
+
+# Top-N author rankings by points, likes received, post count and comment
+# quality (the quality points earned from AI-scored comments). Requests only
+# read memory: a background thread per process keeps the boards fresh.
+#
+# Every board holds at most 2 x LEADERBOARD_SIZE users. A reconcile, every
+# LEADERBOARD_RECONCILE_SECONDS, reloads them with one ORDER BY ... LIMIT
+# query per board and remembers the last (score, user id) it kept (the
+# floor): users who were left out rank below it, ties broken by user id as in
+# the author directory. In between, every
+# LEADERBOARD_POLL_SECONDS the thread reads the points ledger events written
+# since the last poll (by any process) and re-reads the exact scores of the
+# users they touch, with one indexed query per board. A user joins a board by
+# beating its floor, and only entries above the floor are ranked, so the top
+# list stays exact. Changes that leave no ledger event (a deleted post) wait
+# for the next reconcile. Until the first reconcile has finished the boards
+# are empty and the author directory shows SQL order.
+
+BOARDS = ('points', 'likes', 'posts', 'quality')
+
+QUALITY_REASONS = ('comment_scored', 'rescore', 'comment_deleted')
+
+def _boards_touched(reason):
+    # Boards whose score one ledger event can change
+    boards = ['points']
+    if reason == 'post_liked':
+        boards.append('likes')
+    elif reason == 'post_created':
+        boards.append('posts')
+    elif reason in QUALITY_REASONS:
+        boards.append('quality')
+    return boards
+
+def _comment_points():
+    # points_for_score() in SQL
+    thresholds, rewards = Config.COMMENT_QUALITY_THRESHOLDS, Config.COMMENT_QUALITY_REWARDS
+    return db.case(
+        (db.func.coalesce(Comment.ai_score, 0) == 0, 0),
+        (Comment.ai_score <= thresholds['low'], rewards['low']),
+        (Comment.ai_score <= thresholds['medium'], rewards['medium']),
+        else_=rewards['high']
+    )
+
+def _score_query(board):
+    # (user_id, score) for one board, and the user id column to filter on
+    if board == 'points':
+        return db.select(User.id, db.func.coalesce(User.points, 0).label('score')), User.id
+    if board == 'likes':
+        return db.select(User.id, User.likes_received.label('score')).where(User.likes_received != 0), User.id
+    if board == 'posts':
+        return db.select(Post.user_id, db.func.count(Post.id).label('score')).group_by(Post.user_id), Post.user_id
+    return (
+        db.select(Comment.user_id, db.func.sum(_comment_points()).label('score')).group_by(Comment.user_id),
+        Comment.user_id
+    )
+
+def load_top(board, limit):
+    """[(user_id, score)] of the `limit` best users of a board, from the live tables."""
+    query, user_id = _score_query(board)
+    score = query.selected_columns.score
+    return db.session.execute(query.order_by(score.desc(), user_id.desc()).limit(limit)).all()
+
+def load_scores(board, user_ids):
+    """{user_id: score} on a board for the given users (0 for users without any)."""
+    query, user_id = _score_query(board)
+    scores = dict(db.session.execute(query.where(user_id.in_(user_ids))).all())
+    return {uid: scores.get(uid, 0) for uid in user_ids}
+
+class Leaderboards:
+    """Bounded in-process rankings, refreshed by a background thread from the database and the points ledger."""
+
+    def __init__(self, app, size, poll_interval, reconcile_interval):
+        self.app = app
+        self.size = size
+        self.capacity = 2 * size
+        self.poll_interval = poll_interval
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._scores = {board: {} for board in BOARDS}
+        self._floor = {board: None for board in BOARDS}  # (score, user_id), or None if nobody was cut off
+        self._top = {board: None for board in BOARDS}  # None: rebuild on the next read
+        self._last_event_id = 0
+        self._reconciled_at = None
+        self._thread = None
+        self.events_applied = 0
+
+    def _ensure_started(self):
+        # Started on first use so the thread lives in the gunicorn worker, not a forking parent
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='leaderboard-refresher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing leaderboards: {str(e)}")
+            time.sleep(self.poll_interval)
+
+    def reconcile(self):
+        """Reload every board from the database. Needs an app context."""
+        # Read the ledger position first: users touched by an event written in
+        # between are read again by the next poll, which is harmless
+        last_event_id = db.session.scalar(db.select(db.func.max(PointsEvent.id))) or 0
+        boards = {board: load_top(board, self.capacity) for board in BOARDS}
+        with self._lock:
+            for board, rows in boards.items():
+                self._scores[board] = dict(rows)
+                self._floor[board] = (rows[-1][1], rows[-1][0]) if len(rows) == self.capacity else None
+            self._top = {board: None for board in BOARDS}
+            self._last_event_id = last_event_id
+            self._reconciled_at = time.monotonic()
+
+    def poll(self):
+        """Re-read the scores of the users touched by ledger events since the last poll. Needs an app context."""
+        events = db.session.execute(
+            db.select(PointsEvent.id, PointsEvent.user_id, PointsEvent.reason)
+            .where(PointsEvent.id > self._last_event_id)
+            .order_by(PointsEvent.id)
+        ).all()
+        if not events:
+            return
+        touched = {board: set() for board in BOARDS}
+        for _, user_id, reason in events:
+            for board in _boards_touched(reason):
+                touched[board].add(user_id)
+        scores = {board: load_scores(board, user_ids) for board, user_ids in touched.items() if user_ids}
+        with self._lock:
+            for board, board_scores in scores.items():
+                self._apply(board, board_scores)
+            self._last_event_id = events[-1].id
+            self.events_applied += len(events)
+
+    def _apply(self, board, scores):
+        kept, floor = self._scores[board], self._floor[board]
+        for user_id, score in scores.items():
+            if user_id in kept or floor is None or (score, user_id) > floor:
+                kept[user_id] = score
+        if len(kept) > self.capacity:
+            # Drop the lowest entries; everybody left out ranks below the new floor
+            cut = heapq.nsmallest(len(kept) - self.capacity, ((score, user_id) for user_id, score in kept.items()))
+            for _, user_id in cut:
+                del kept[user_id]
+            self._floor[board] = max(cut[-1], floor) if floor is not None else cut[-1]
+        self._top[board] = None
+
+    def refresh(self):
+        """Reconcile or poll, whichever is due. Needs an app context."""
+        if self._reconciled_at is None or time.monotonic() - self._reconciled_at >= self.reconcile_interval:
+            self.reconcile()
+        else:
+            self.poll()
+
+    def top(self, board, limit=None):
+        """[(user_id, score)] best first, at most `limit` (and the board size) entries. Reads memory only."""
+        if board not in BOARDS:
+            raise ValueError(f'Unknown leaderboard: {board}')
+        self._ensure_started()
+        with self._lock:
+            top = self._top[board]
+            if top is None:
+                # Above the floor only: a user who was cut off could beat anyone below it.
+                # Ties broken by the newest user, as in the author directory.
+                floor = self._floor[board]
+                top = heapq.nlargest(self.size, (
+                    entry for entry in ((score, user_id) for user_id, score in self._scores[board].items())
+                    if floor is None or entry > floor
+                ))
+                self._top[board] = top
+        return [(user_id, score) for score, user_id in top[:limit or self.size]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'entries': {board: len(scores) for board, scores in self._scores.items()},
+                'last_event_id': self._last_event_id,
+                'events_applied': self.events_applied,
+                'reconciled_seconds_ago': (
+                    round(time.monotonic() - self._reconciled_at, 1) if self._reconciled_at is not None else None
+                )
+            }
+
+def init_leaderboards(app):
+    app.extensions['leaderboards'] = Leaderboards(
+        app,
+        Config.LEADERBOARD_SIZE, Config.LEADERBOARD_POLL_SECONDS, Config.LEADERBOARD_RECONCILE_SECONDS
+    )
+
+def get_leaderboards():
+    return current_app.extensions['leaderboards']
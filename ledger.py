@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from models import db, User, PointsEvent, PointsSnapshot
+from config import Config
+from user_cache import mark_users_changed
+
+# Append-only ledger of point changes. Every change to User.points also
+# inserts a PointsEvent in the same transaction (see counters.add_points), so
+# User.points is a cached sum of the ledger that can be audited and rebuilt.
+# compact_ledger() periodically folds events into one PointsSnapshot per
+# user; a balance is then the snapshot plus the user's events after
+# snapshot.last_event_id. Readers such as leaderboards can follow the ledger
+# incrementally by event id. Recording an event also drops the user from the
+# login cache (user_cache.py) when the transaction commits.
+
+def record_points(user_id, delta, reason, ref_id=None):
+    """Append one event. Does not commit."""
+    db.session.execute(
+        db.insert(PointsEvent).values(user_id=user_id, delta=delta, reason=reason, ref_id=ref_id)
+    )
+    mark_users_changed([user_id])
+
+def record_points_many(events):
+    """Append events given as dicts with user_id, delta, reason and optionally ref_id, in one executemany."""
+    if events:
+        db.session.execute(
+            db.insert(PointsEvent),
+            [{'user_id': e['user_id'], 'delta': e['delta'], 'reason': e['reason'], 'ref_id': e.get('ref_id')}
+             for e in events]
+        )
+        mark_users_changed({e['user_id'] for e in events})
+
+def paid_by_ref(ref_ids, reasons):
+    """Sum of the event deltas per ref_id for the given reasons, e.g. what each comment's score has paid."""
+    if not ref_ids:
+        return {}
+    return dict(db.session.execute(
+        db.select(PointsEvent.ref_id, db.func.sum(PointsEvent.delta))
+        .where(PointsEvent.ref_id.in_(ref_ids), PointsEvent.reason.in_(reasons))
+        .group_by(PointsEvent.ref_id)
+    ).all())
+
+def _snapshot_id():
+    # Id of the last event already folded into the event's user's snapshot (0 without one)
+    return db.func.coalesce(PointsSnapshot.last_event_id, 0)
+
+def ledger_balance(user_id):
+    """Recompute a user's balance from the snapshot and the events after it."""
+    snapshot = db.session.get(PointsSnapshot, user_id)
+    balance, after = (snapshot.balance, snapshot.last_event_id) if snapshot else (0, 0)
+    return balance + db.session.scalar(
+        db.select(db.func.coalesce(db.func.sum(PointsEvent.delta), 0))
+        .where(PointsEvent.user_id == user_id, PointsEvent.id > after)
+    )
+
+def unbalanced_users(limit=None):
+    """(user_id, points, ledger balance) for every user whose User.points disagrees with the ledger."""
+    recent = (
+        db.select(PointsEvent.user_id.label('user_id'), db.func.sum(PointsEvent.delta).label('total'))
+        .outerjoin(PointsSnapshot, PointsSnapshot.user_id == PointsEvent.user_id)
+        .where(PointsEvent.id > _snapshot_id())
+        .group_by(PointsEvent.user_id)
+        .subquery()
+    )
+    points = db.func.coalesce(User.points, 0)
+    balance = db.func.coalesce(PointsSnapshot.balance, 0) + db.func.coalesce(recent.c.total, 0)
+    query = (
+        db.select(User.id, points, balance)
+        .outerjoin(PointsSnapshot, PointsSnapshot.user_id == User.id)
+        .outerjoin(recent, recent.c.user_id == User.id)
+        .where(points != balance)
+        .order_by(User.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
+
+def open_balances():
+    """Give users that have points but no ledger history an opening_balance event.
+
+    For rows written without the ledger: bulk loads and imports. Returns the
+    number of events added. Does not commit.
+    """
+    has_history = db.or_(
+        db.exists().where(PointsEvent.user_id == User.id),
+        db.exists().where(PointsSnapshot.user_id == User.id)
+    )
+    result = db.session.execute(
+        db.insert(PointsEvent).from_select(
+            ['user_id', 'delta', 'reason', 'created_at'],
+            db.select(User.id, User.points, db.literal('opening_balance'), db.literal(datetime.utcnow()))
+            .where(db.func.coalesce(User.points, 0) != 0, ~has_history)
+        )
+    )
+    return result.rowcount
+
+def compact_ledger(prune=False):
+    """Fold settled events into per-user snapshots. Returns the number of events folded.
+
+    Events younger than POINTS_SNAPSHOT_SETTLE_SECONDS are left for the next
+    run, so a transaction that took an event id but has not committed yet is
+    not skipped over. With prune, folded events are deleted afterwards.
+    Does not commit.
+    """
+    settled = datetime.utcnow() - timedelta(seconds=Config.POINTS_SNAPSHOT_SETTLE_SECONDS)
+    cutoff = db.session.scalar(db.select(db.func.max(PointsEvent.id)).where(PointsEvent.created_at < settled))
+    if cutoff is None:
+        return 0
+
+    rows = db.session.execute(
+        db.select(
+            PointsEvent.user_id,
+            PointsSnapshot.user_id.isnot(None),
+            db.func.sum(PointsEvent.delta),
+            db.func.count()
+        )
+        .outerjoin(PointsSnapshot, PointsSnapshot.user_id == PointsEvent.user_id)
+        .where(PointsEvent.id > _snapshot_id(), PointsEvent.id <= cutoff)
+        .group_by(PointsEvent.user_id, PointsSnapshot.user_id)
+    ).all()
+
+    now = datetime.utcnow()
+    snapshots = PointsSnapshot.__table__
+    updates = [{'uid': user_id, 'total': total} for user_id, exists, total, _ in rows if exists]
+    inserts = [{'user_id': user_id, 'balance': total, 'last_event_id': cutoff, 'updated_at': now}
+               for user_id, exists, total, _ in rows if not exists]
+    if updates:
+        db.session.execute(
+            snapshots.update()
+            .where(snapshots.c.user_id == db.bindparam('uid'))
+            .values(balance=snapshots.c.balance + db.bindparam('total'), last_event_id=cutoff, updated_at=now),
+            updates
+        )
+    if inserts:
+        db.session.execute(snapshots.insert(), inserts)
+    if prune:
+        db.session.execute(
+            db.delete(PointsEvent).where(PointsEvent.id <= cutoff),
+            execution_options={'synchronize_session': False}
+        )
+    return sum(count for *_, count in rows)
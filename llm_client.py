@@ -0,0 +1,214 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+import httpx
+import openai
+from openai import OpenAI
+from config import Config
+from evaluation_log import log_event
+from metrics import observe_llm_call, LLM_SHORT_CIRCUITED
+
+# Process-wide client for the evaluation LLM. One OpenAI client (and so one
+# pooled httpx connection pool with keep-alive) is shared by every thread.
+# Each call gets an overall deadline, transient failures are retried with
+# jittered exponential backoff, and a circuit breaker stops calling the
+# provider while it is failing so callers fall back to length-based scoring.
+# Only provider trouble (timeouts, connection errors, 429 and 5xx) counts
+# against the breaker; a 400 or another client-side error does not. Attempts
+# and latency are not logged per call but added to the caller's evaluation
+# record through call_stats().
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open after a cool-down."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.transitions = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        if state == self.state:
+            return
+        logging.warning(f"LLM circuit breaker {self.state} -> {state}")
+        log_event('circuit_state', logging.WARNING, previous=self.state, state=state, failures=self.failures)
+        self.state = state
+        self.transitions += 1
+
+    def allow(self):
+        """Whether a call may go out now. In half-open state only one trial call is let through."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            self._transition(self.CLOSED)
+
+    def release(self):
+        """End a call that says nothing about the provider's health, e.g. one rejected with a 400."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+# Errors worth retrying, and the only ones that count against the breaker:
+# network problems and timeouts, 429 and 5xx
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+_local = threading.local()
+
+@contextmanager
+def call_stats(target):
+    """Add the attempts, latency and errors of the LLM calls made by this thread in the block to target."""
+    _local.stats = target
+    try:
+        yield target
+    finally:
+        _local.stats = None
+
+def _add_call_stats(elapsed, outcome):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats['llm_attempts'] = stats.get('llm_attempts', 0) + 1
+        stats['llm_latency_ms'] = round(stats.get('llm_latency_ms', 0) + elapsed * 1000, 1)
+        if outcome != 'ok':
+            stats.setdefault('llm_errors', []).append(outcome)
+
+class LLMClient:
+    """Shared chat-completions client with deadlines, retries and a circuit breaker."""
+
+    def __init__(self, api_key, base_url=None, model=Config.LLM_MODEL, deadline=Config.LLM_DEADLINE,
+                 max_retries=Config.LLM_MAX_RETRIES, backoff=Config.LLM_BACKOFF,
+                 breaker=None, pool_size=Config.LLM_POOL_SIZE):
+        self.model = model
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker(Config.LLM_BREAKER_THRESHOLD, Config.LLM_BREAKER_RESET)
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,  # retries are handled here so they respect the deadline
+            timeout=deadline,
+            http_client=httpx.Client(
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=deadline
+            )
+        )
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _record(self, elapsed, outcome):
+        ok = outcome == 'ok'
+        observe_llm_call(elapsed, outcome)
+        _add_call_stats(elapsed, outcome)
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+
+    def complete(self, messages, **kwargs):
+        """Return the message content of one chat completion.
+
+        Raises CircuitOpenError without calling the provider while the breaker is open.
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.short_circuited += 1
+            LLM_SHORT_CIRCUITED.inc()
+            raise CircuitOpenError('LLM provider circuit is open')
+
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = give_up_at - time.monotonic()
+            started = time.perf_counter()
+            try:
+                if remaining <= 0:
+                    raise openai.APITimeoutError(request=None)
+                response = self.client.chat.completions.create(
+                    model=self.model, messages=messages, timeout=remaining, **kwargs
+                )
+            except Exception as e:
+                self._record(time.perf_counter() - started, type(e).__name__)
+                if not isinstance(e, RETRYABLE_ERRORS):
+                    self.breaker.release()
+                    raise
+                # Full jitter: sleep a random time up to backoff * 2^attempt, within the deadline
+                delay = random.uniform(0, self.backoff * (2 ** attempt))
+                if attempt >= self.max_retries or time.monotonic() + delay >= give_up_at:
+                    self.breaker.record_failure()
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            self._record(time.perf_counter() - started, 'ok')
+            self.breaker.record_success()
+            return response.choices[0].message.content
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.breaker.state,
+                'transitions': self.breaker.transitions,
+                'calls': self.calls,
+                'failures': self.failures,
+                'short_circuited': self.short_circuited,
+                'latency_ms_avg': round(self.latency_total / self.calls * 1000, 1) if self.calls else 0.0,
+                'latency_ms_max': round(self.latency_max * 1000, 1)
+            }
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_llm_client(app):
+    """Return the process-wide LLM client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    api_key=app.config.get('OPENAI_API_KEY'),
+                    base_url=app.config.get('OPENAI_BASE_URL')
+                )
+    return _client
+
+def peek_llm_client():
+    """The LLM client if one has been created in this process, else None."""
+    return _client
@@ -0,0 +1,212 @@
+import bisect
+import hmac
+import logging
+import threading
+import time
+from http import HTTPStatus
+from flask import g, request, has_request_context, current_app, abort
+from sqlalchemy import event
+from models import db
+from config import Config
+
+# Request, SQL and LLM instrumentation exposed in the Prometheus text format
+# on /metrics, which needs `Authorization: Bearer <METRICS_TOKEN>` and is not
+# found at all when no token is configured. The collectors are tiny in-process
+# implementations, so values are per process: with several gunicorn workers
+# each scrape sees the worker that answered it. SQL statements are timed with
+# engine events and attributed to the current request (if any) through
+# flask.g, which also feeds the optional slow-request log.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self):
+        """{labels: (count, sum)} for every series."""
+        with self._lock:
+            return {labels: (series[-1], series[-2]) for labels, series in self._values.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", "+Inf")])} {series[-1]}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}')
+        return lines
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, name, help, callback):
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {value}']
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.', ['endpoint', 'method', 'status']
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_sql_queries', 'SQL statements executed per request.', ['endpoint'], QUERY_COUNT_BUCKETS
+)
+REQUEST_SQL_TIME = Histogram(
+    'http_request_sql_duration_seconds', 'Time spent in SQL per request.', ['endpoint']
+)
+SQL_QUERIES = Counter('sql_queries_total', 'SQL statements executed, in and outside requests.')
+SQL_TIME = Counter('sql_duration_seconds_total', 'Time spent executing SQL statements.')
+LLM_LATENCY = Histogram(
+    'llm_request_duration_seconds', 'Latency of LLM provider calls by outcome.', ['outcome'], LLM_BUCKETS
+)
+LLM_SHORT_CIRCUITED = Counter('llm_short_circuited_total', 'LLM calls refused by the open circuit breaker.')
+
+COLLECTORS = [
+    REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_SQL_TIME, SQL_QUERIES, SQL_TIME, LLM_LATENCY, LLM_SHORT_CIRCUITED
+]
+
+def observe_llm_call(elapsed, outcome):
+    LLM_LATENCY.observe(elapsed, outcome)
+
+def render_metrics(extra=()):
+    lines = []
+    for collector in [*COLLECTORS, *extra]:
+        lines.extend(collector.render())
+    return '\n'.join(lines) + '\n'
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    SQL_QUERIES.inc()
+    SQL_TIME.inc(amount=elapsed)
+    if has_request_context() and 'sql_count' in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+        if g.sql_statements is not None:
+            g.sql_statements.append((elapsed, statement))
+
+def _handle_error(context):
+    # after_cursor_execute does not run for a failed statement
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    # Statements are only kept when the slow-request log is on
+    g.sql_statements = [] if current_app.config.get('SLOW_REQUEST_MS') else None
+
+def _record_status(response):
+    g.response_status = response.status_code
+    return response
+
+def _finish_request(error=None):
+    if 'request_started' not in g:
+        return
+    elapsed = time.perf_counter() - g.request_started
+    # The URL rule, not the path, keeps label cardinality bounded
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = g.get('response_status', 500)
+    REQUEST_LATENCY.observe(elapsed, endpoint, request.method, status)
+    REQUEST_QUERIES.observe(g.sql_count, endpoint)
+    REQUEST_SQL_TIME.observe(g.sql_time, endpoint)
+
+    slow_ms = current_app.config.get('SLOW_REQUEST_MS')
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        slowest = sorted(g.sql_statements, reverse=True)[:Config.SLOW_REQUEST_STATEMENTS]
+        statements = '\n'.join(f'  {seconds * 1000:.1f} ms: {" ".join(statement.split())}' for seconds, statement in slowest)
+        logging.warning(
+            f"Slow request {request.method} {request.path}: {elapsed * 1000:.0f} ms, "
+            f"{g.sql_count} queries in {g.sql_time * 1000:.0f} ms\n{statements}"
+        )
+
+def init_metrics(app):
+    """Register the request hooks, the SQL engine listeners and the /metrics route."""
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+
+    gauges = []
+    evaluation_queue = app.extensions.get('evaluation_queue')
+    if evaluation_queue is not None:
+        gauges.append(Gauge('evaluation_queue_depth', 'Comments waiting for evaluation.', evaluation_queue.jobs.qsize))
+    guest_likes = app.extensions.get('guest_likes')
+    if guest_likes is not None:
+        gauges.append(Gauge('guest_likes_pending', 'Guest likes buffered but not yet written.', lambda: guest_likes.pending))
+
+    @app.route('/metrics')
+    def metrics():
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token:
+            abort(HTTPStatus.NOT_FOUND)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return 'Unauthorized\n', HTTPStatus.UNAUTHORIZED, {'WWW-Authenticate': 'Bearer'}
+        return render_metrics(gauges), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
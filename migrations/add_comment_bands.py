@@ -0,0 +1,35 @@
+"""Add comment_band table holding the near-duplicate LSH index
+
+Revision ID: add_comment_bands
+Revises: add_feed_generation
+Create Date: 2025-04-10 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_comment_bands'
+down_revision = 'add_feed_generation'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'comment_band',
+        sa.Column('comment_id', sa.Integer(), nullable=False),
+        sa.Column('band', sa.SmallInteger(), nullable=False),
+        sa.Column('band_key', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['comment_id'], ['comment.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('comment_id', 'band')
+    )
+    op.create_index('ix_comment_band_key', 'comment_band', ['band_key'])
+    # Fill it from the stored signatures with `flask rebuild-duplicate-index`
+    # (bulk loads with `flask seed` / `flask import-jsonl` fill it themselves)
+
+
+def downgrade():
+    op.drop_index('ix_comment_band_key', table_name='comment_band')
+    op.drop_table('comment_band')
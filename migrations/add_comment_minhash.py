@@ -0,0 +1,25 @@
+"""Add minhash column to comment table
+
+Revision ID: add_comment_minhash
+Revises: add_evaluation_cache
+Create Date: 2025-04-01 15:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_comment_minhash'
+down_revision = 'add_evaluation_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backfill with `flask rebuild-duplicate-index`
+    op.add_column('comment', sa.Column('minhash', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('comment', 'minhash')
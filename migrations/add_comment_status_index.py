@@ -0,0 +1,23 @@
+"""Add index for the sweep that re-queues stale pending comments
+
+Revision ID: add_comment_status_index
+Revises: add_comment_bands
+Create Date: 2025-04-11 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_comment_status_index'
+down_revision = 'add_comment_bands'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_comment_evaluation_status_created_at', 'comment', ['evaluation_status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_comment_evaluation_status_created_at', table_name='comment')
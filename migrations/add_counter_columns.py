@@ -0,0 +1,46 @@
+"""Add denormalized like/comment counters to post, comment and user
+
+Revision ID: add_counter_columns
+Revises: add_bio_column
+Create Date: 2025-03-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_counter_columns'
+down_revision = 'add_bio_column'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('post', sa.Column('like_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('post', sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('comment', sa.Column('like_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('user', sa.Column('likes_received', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the base tables (same queries as `flask recount`)
+    op.execute(
+        'UPDATE post SET '
+        'like_count = (SELECT COUNT(*) FROM "like" WHERE "like".post_id = post.id), '
+        'comment_count = (SELECT COUNT(*) FROM comment WHERE comment.post_id = post.id)'
+    )
+    op.execute(
+        'UPDATE comment SET '
+        'like_count = (SELECT COUNT(*) FROM "like" WHERE "like".comment_id = comment.id)'
+    )
+    op.execute(
+        'UPDATE "user" SET '
+        'likes_received = (SELECT COUNT(*) FROM "like" JOIN post ON "like".post_id = post.id '
+        'WHERE post.user_id = "user".id)'
+    )
+
+
+def downgrade():
+    op.drop_column('user', 'likes_received')
+    op.drop_column('comment', 'like_count')
+    op.drop_column('post', 'comment_count')
+    op.drop_column('post', 'like_count')
@@ -0,0 +1,31 @@
+"""Add evaluation_cache table
+
+Revision ID: add_evaluation_cache
+Revises: add_evaluation_status
+Create Date: 2025-03-26 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_evaluation_cache'
+down_revision = 'add_evaluation_status'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'evaluation_cache',
+        sa.Column('key', sa.String(length=64), primary_key=True),
+        sa.Column('score', sa.Integer(), nullable=False),
+        sa.Column('is_spam_copied', sa.Boolean(), nullable=False),
+        sa.Column('reasoning', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_table('evaluation_cache')
@@ -0,0 +1,23 @@
+"""Add an index for pruning expired evaluation cache entries
+
+Revision ID: add_evaluation_cache_created_at
+Revises: add_user_sort_indexes
+Create Date: 2025-04-12 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_evaluation_cache_created_at'
+down_revision = 'add_user_sort_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_evaluation_cache_created_at', 'evaluation_cache', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_evaluation_cache_created_at', table_name='evaluation_cache')
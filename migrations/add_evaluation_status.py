@@ -0,0 +1,24 @@
+"""Add evaluation_status column to comment table
+
+Revision ID: add_evaluation_status
+Revises: add_counter_columns
+Create Date: 2025-03-24 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_evaluation_status'
+down_revision = 'add_counter_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('comment', sa.Column('evaluation_status', sa.String(length=20), nullable=False, server_default='done'))
+
+
+def downgrade():
+    op.drop_column('comment', 'evaluation_status')
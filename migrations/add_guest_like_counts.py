@@ -0,0 +1,27 @@
+"""Add guest_like_count columns to post and comment tables
+
+Revision ID: add_guest_like_counts
+Revises: add_like_unique_indexes
+Create Date: 2025-04-03 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_guest_like_counts'
+down_revision = 'add_like_unique_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Guest likes were never stored before, so existing rows start at zero
+    op.add_column('post', sa.Column('guest_like_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('comment', sa.Column('guest_like_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('comment', 'guest_like_count')
+    op.drop_column('post', 'guest_like_count')
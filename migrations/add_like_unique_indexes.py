@@ -0,0 +1,35 @@
+"""Add unique indexes on like (user_id, post_id) and (user_id, comment_id)
+
+Revision ID: add_like_unique_indexes
+Revises: add_post_updated_at
+Create Date: 2025-04-03 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_like_unique_indexes'
+down_revision = 'add_post_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate likes left by the old read-then-insert toggle, keeping
+    # the oldest. Run `flask recount` afterwards to fix the counters.
+    op.execute(
+        'DELETE FROM "like" WHERE post_id IS NOT NULL AND id NOT IN '
+        '(SELECT MIN(id) FROM "like" WHERE post_id IS NOT NULL GROUP BY user_id, post_id)'
+    )
+    op.execute(
+        'DELETE FROM "like" WHERE comment_id IS NOT NULL AND id NOT IN '
+        '(SELECT MIN(id) FROM "like" WHERE comment_id IS NOT NULL GROUP BY user_id, comment_id)'
+    )
+    op.create_index('uq_like_user_post', 'like', ['user_id', 'post_id'], unique=True)
+    op.create_index('uq_like_user_comment', 'like', ['user_id', 'comment_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_like_user_comment', table_name='like')
+    op.drop_index('uq_like_user_post', table_name='like')
@@ -0,0 +1,52 @@
+"""Add points_event ledger and points_snapshot tables
+
+Revision ID: add_points_ledger
+Revises: add_guest_like_counts
+Create Date: 2025-04-04 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_points_ledger'
+down_revision = 'add_guest_like_counts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'points_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.Column('reason', sa.String(length=30), nullable=False),
+        sa.Column('ref_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_points_event_user_id_id', 'points_event', ['user_id', 'id'])
+    op.create_table(
+        'points_snapshot',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('balance', sa.Integer(), nullable=False),
+        sa.Column('last_event_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    # There is no history before the ledger: current balances become the opening events
+    op.execute(
+        "INSERT INTO points_event (user_id, delta, reason, created_at) "
+        "SELECT id, points, 'opening_balance', CURRENT_TIMESTAMP FROM \"user\" "
+        "WHERE points IS NOT NULL AND points != 0"
+    )
+
+
+def downgrade():
+    op.drop_table('points_snapshot')
+    op.drop_index('ix_points_event_user_id_id', table_name='points_event')
+    op.drop_table('points_event')
@@ -0,0 +1,29 @@
+"""Add hot_score column and trending-feed indexes to post table
+
+Revision ID: add_post_hot_score
+Revises: add_post_search
+Create Date: 2025-04-08 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_post_hot_score'
+down_revision = 'add_post_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('post', sa.Column('hot_score', sa.Float(), nullable=False, server_default='0'))
+    op.create_index('ix_post_hot_score', 'post', ['hot_score', 'id'])
+    op.create_index('ix_post_type_hot_score', 'post', ['post_type', 'hot_score', 'id'])
+    # Existing posts start at 0; run `flask recompute-trending` afterwards
+
+
+def downgrade():
+    op.drop_index('ix_post_type_hot_score', table_name='post')
+    op.drop_index('ix_post_hot_score', table_name='post')
+    op.drop_column('post', 'hot_score')
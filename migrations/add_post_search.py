@@ -0,0 +1,36 @@
+"""Add post_search full-text index (FTS5 on SQLite, tsvector with GIN on PostgreSQL)
+
+Revision ID: add_post_search
+Revises: add_post_shuffle_key
+Create Date: 2025-04-05 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_post_search'
+down_revision = 'add_post_shuffle_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Text is folded in Python before indexing, so fill the index afterwards
+    # with `flask rebuild-search-index`
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS post_search ("
+            "post_id INTEGER PRIMARY KEY REFERENCES post (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_post_search_document ON post_search USING GIN (document)")
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS post_search "
+            "USING fts5(title, description, content, tokenize='unicode61')"
+        )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS post_search")
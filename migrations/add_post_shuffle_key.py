@@ -0,0 +1,32 @@
+"""Add shuffle_key column and random-feed indexes to post table
+
+Revision ID: add_post_shuffle_key
+Revises: add_points_ledger
+Create Date: 2025-04-04 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_post_shuffle_key'
+down_revision = 'add_points_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('post', sa.Column('shuffle_key', sa.Integer(), nullable=False, server_default='0'))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('UPDATE post SET shuffle_key = floor(random() * 2147483647)::integer')
+    else:
+        op.execute('UPDATE post SET shuffle_key = abs(random()) % 2147483647')
+    op.create_index('ix_post_shuffle_key', 'post', ['shuffle_key', 'id'])
+    op.create_index('ix_post_type_shuffle_key', 'post', ['post_type', 'shuffle_key', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_post_type_shuffle_key', table_name='post')
+    op.drop_index('ix_post_shuffle_key', table_name='post')
+    op.drop_column('post', 'shuffle_key')
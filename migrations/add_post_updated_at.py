@@ -0,0 +1,25 @@
+"""Add updated_at column to post table
+
+Revision ID: add_post_updated_at
+Revises: add_post_version
+Create Date: 2025-04-02 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_post_updated_at'
+down_revision = 'add_post_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('post', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE post SET updated_at = created_at')
+
+
+def downgrade():
+    op.drop_column('post', 'updated_at')
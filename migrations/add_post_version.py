@@ -0,0 +1,24 @@
+"""Add version column to post table
+
+Revision ID: add_post_version
+Revises: add_comment_minhash
+Create Date: 2025-04-02 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_post_version'
+down_revision = 'add_comment_minhash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('post', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('post', 'version')
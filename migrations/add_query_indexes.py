@@ -0,0 +1,39 @@
+"""Add composite indexes for the feed, comment, like, author and login queries
+
+Revision ID: add_query_indexes
+Revises: add_post_hot_score
+Create Date: 2025-04-09 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_query_indexes'
+down_revision = 'add_post_hot_score'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_post_type_created_at', 'post', ['post_type', 'created_at', 'id']),
+    ('ix_post_like_count', 'post', ['like_count', 'id']),
+    ('ix_post_type_like_count', 'post', ['post_type', 'like_count', 'id']),
+    ('ix_post_comment_count', 'post', ['comment_count', 'id']),
+    ('ix_post_type_comment_count', 'post', ['post_type', 'comment_count', 'id']),
+    ('ix_post_user_id_created_at', 'post', ['user_id', 'created_at']),
+    ('ix_comment_post_id_created_at', 'comment', ['post_id', 'created_at', 'id']),
+    ('ix_comment_user_id_created_at', 'comment', ['user_id', 'created_at']),
+    ('ix_like_post_id', 'like', ['post_id']),
+    ('ix_like_comment_id', 'like', ['comment_id']),
+    ('ix_user_activity_user_id_login_date', 'user_activity', ['user_id', 'login_date']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,25 @@
+"""Add indexes for the author directory sorts
+
+Revision ID: add_user_sort_indexes
+Revises: add_comment_status_index
+Create Date: 2025-04-11 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_sort_indexes'
+down_revision = 'add_comment_status_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_created_at', 'user', ['created_at', 'id'])
+    op.create_index('ix_user_likes_received', 'user', ['likes_received', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_user_likes_received', table_name='user')
+    op.drop_index('ix_user_created_at', table_name='user')
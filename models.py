@@ -1,11 +1,31 @@
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+SHUFFLE_KEY_SPACE = 2 ** 31 - 1
+
+def random_shuffle_key():
+    """A random Post.shuffle_key (also used as the starting point of a random feed)."""
+    return random.randrange(SHUFFLE_KEY_SPACE)
+
+def post_revision(post_id, created_at, version):
+    """Tag for one state of one post row.
+
+    The id and version alone repeat when SQLite hands a deleted post's id to
+    the next new post, so the creation time (in microseconds) is part of it.
+    """
+    created = (created_at - datetime(1970, 1, 1)) // timedelta(microseconds=1) if created_at else 0
+    return f'{post_id}-{created:x}-{version}'
+
 class UserActivity(db.Model):
     __tablename__ = 'user_activity'
+    # Today's row and the previous login, looked up on every login
+    __table_args__ = (
+        db.Index('ix_user_activity_user_id_login_date', 'user_id', 'login_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
@@ -17,6 +37,11 @@ class UserActivity(db.Model):
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
+    # Author directory, newest members first or by likes received
+    __table_args__ = (
+        db.Index('ix_user_created_at', 'created_at', 'id'),
+        db.Index('ix_user_likes_received', 'likes_received', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
@@ -27,6 +52,7 @@ class User(UserMixin, db.Model):
     favorite_quote = db.Column(db.String(500), nullable=True)
     google_id = db.Column(db.String(100), unique=True, nullable=True)
     points = db.Column(db.Integer, default=0)
+    likes_received = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Likes on the user's posts
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
@@ -39,6 +65,22 @@ class User(UserMixin, db.Model):
 
 class Post(db.Model):
     __tablename__ = 'post'
+    # Random feed: one index range scan per page, with or without a type filter
+    __table_args__ = (
+        db.Index('ix_post_shuffle_key', 'shuffle_key', 'id'),
+        db.Index('ix_post_type_shuffle_key', 'post_type', 'shuffle_key', 'id'),
+        # Trending feed, read the same way
+        db.Index('ix_post_hot_score', 'hot_score', 'id'),
+        db.Index('ix_post_type_hot_score', 'post_type', 'hot_score', 'id'),
+        # Feed sorts filtered by post type, and the by-likes/by-comments sorts
+        db.Index('ix_post_type_created_at', 'post_type', 'created_at', 'id'),
+        db.Index('ix_post_like_count', 'like_count', 'id'),
+        db.Index('ix_post_type_like_count', 'post_type', 'like_count', 'id'),
+        db.Index('ix_post_comment_count', 'comment_count', 'id'),
+        db.Index('ix_post_type_comment_count', 'post_type', 'comment_count', 'id'),
+        # Per-author counts and latest post (author directory, profile)
+        db.Index('ix_post_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -48,31 +90,53 @@ class Post(db.Model):
     post_type = db.Column(db.String(50), nullable=False)  # 'poetry' or 'story'
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized counters, kept in sync by counters.py
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    guest_like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Flushed by guest_likes.py
+    # Bumped whenever the rendered post or its comments change; keys cached fragments
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # Set together with version
+    # Position in the random feed, redrawn by `flask reshuffle-posts`; drawn per row even in bulk loads
+    shuffle_key = db.Column(db.Integer, nullable=False, default=random_shuffle_key, server_default='0',
+                            info={'per_row_default': True})
+    # Log-space, time-decayed heat of likes and comments, see trending.py
+    hot_score = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    # Preview text for list views; load with undefer() together with defer(Post.content)
+    excerpt = db.column_property(db.func.substr(content, 1, 150), deferred=True)
 
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='post', lazy=True)
 
+    @property
+    def revision(self):
+        return post_revision(self.id, self.created_at, self.version)
+
     def __repr__(self):
         return f'<Post {self.title}>'
 
-    @property
-    def comment_count(self):
-        return len(self.comments)
-        
-    @property
-    def like_count(self):
-        return len(self.likes)
-
 class Comment(db.Model):
     __tablename__ = 'comment'
+    __table_args__ = (
+        # A post's comments, newest first
+        db.Index('ix_comment_post_id_created_at', 'post_id', 'created_at', 'id'),
+        # Per-author counts, latest comment and quality totals
+        db.Index('ix_comment_user_id_created_at', 'user_id', 'created_at'),
+        # Stale pending comments, re-queued by the evaluation sweep
+        db.Index('ix_comment_evaluation_status_created_at', 'evaluation_status', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     comment_length = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     ai_score = db.Column(db.Integer, nullable=True)
     ai_feedback = db.Column(db.Text, nullable=True)  # Store AI reasoning/feedback
+    evaluation_status = db.Column(db.String(20), nullable=False, default='done', server_default='done')  # 'pending' until scored
+    minhash = db.deferred(db.Column(db.LargeBinary, nullable=True))  # Near-duplicate signature, see duplicates.py
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Denormalized counter
+    guest_like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Flushed by guest_likes.py
     likes = db.relationship('Like', backref='comment', lazy=True)
 
     def __repr__(self):
@@ -88,8 +152,31 @@ class Comment(db.Model):
                 f'Comment length must be between {min_length} and {max_length} characters'
             )
 
+class CommentBand(db.Model):
+    """One LSH band of a comment's MinHash signature, see duplicates.py."""
+    __tablename__ = 'comment_band'
+    __table_args__ = (
+        db.Index('ix_comment_band_key', 'band_key'),
+    )
+
+    comment_id = db.Column(db.Integer, db.ForeignKey('comment.id', ondelete='CASCADE'), primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True)
+    band_key = db.Column(db.BigInteger, nullable=False)  # Band number << 32 | hash of the band's rows
+
+    def __repr__(self):
+        return f'<CommentBand comment_id={self.comment_id} band={self.band}>'
+
 class Like(db.Model):
     __tablename__ = 'like'
+    # One like per user and post/comment. NULLs are distinct, so post likes
+    # and comment likes do not collide with each other.
+    __table_args__ = (
+        db.Index('uq_like_user_post', 'user_id', 'post_id', unique=True),
+        db.Index('uq_like_user_comment', 'user_id', 'comment_id', unique=True),
+        # Likes of one post or comment: recounts, trending, cascading deletes
+        db.Index('ix_like_post_id', 'post_id'),
+        db.Index('ix_like_comment_id', 'comment_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
@@ -99,3 +186,61 @@ class Like(db.Model):
 
     def __repr__(self):
         return f'<Like user_id={self.user_id} post_id={self.post_id} comment_id={self.comment_id}>'
+
+class PointsEvent(db.Model):
+    """One change to a user's points. Rows are only ever appended (see ledger.py)."""
+    __tablename__ = 'points_event'
+    # Balances and incremental readers scan one user's events after a known id
+    __table_args__ = (
+        db.Index('ix_points_event_user_id_id', 'user_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(30), nullable=False)  # e.g. 'daily_login', 'post_created', 'post_liked'
+    ref_id = db.Column(db.Integer, nullable=True)  # Post or comment id, depending on the reason
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PointsEvent user_id={self.user_id} delta={self.delta} reason={self.reason}>'
+
+class PointsSnapshot(db.Model):
+    """A user's balance up to and including last_event_id, written by ledger compaction."""
+    __tablename__ = 'points_snapshot'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    balance = db.Column(db.Integer, nullable=False, default=0)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PointsSnapshot user_id={self.user_id} balance={self.balance}>'
+
+class FeedGeneration(db.Model):
+    """Single row, bumped when posts are created or deleted or the feed order is redrawn."""
+    __tablename__ = 'feed_generation'
+
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<FeedGeneration {self.generation}>'
+
+class CachedEvaluation(db.Model):
+    __tablename__ = 'evaluation_cache'
+    __table_args__ = (
+        # Expired entries are pruned by age
+        db.Index('ix_evaluation_cache_created_at', 'created_at'),
+    )
+
+    # sha256 of the normalized comment text, post id and prompt version
+    key = db.Column(db.String(64), primary_key=True)
+    score = db.Column(db.Integer, nullable=False)
+    is_spam_copied = db.Column(db.Boolean, nullable=False, default=False)
+    reasoning = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CachedEvaluation {self.key[:12]} score={self.score}>'
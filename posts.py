@@ -1,13 +1,23 @@
-from flask import Blueprint, request, jsonify, flash, redirect, url_for, current_app
+from flask import Blueprint, request, jsonify, flash, redirect, url_for, current_app, abort
 from flask_login import login_required, current_user
-from models import db, Post, Comment, Like
+from models import db, User, Post, Comment, Like, post_revision
+from counters import record_post_like, record_comment_like, record_comment, record_post_deleted, add_points, spend_points
+from feed import paginate_feed, feed_page_tag, bump_feed_generation
+from evaluation import get_evaluation_queue, points_for_score
+from llm_client import peek_llm_client
+from prompt_context import post_contexts
+from fragments import get_fragment_cache
+from duplicates import get_duplicate_index, minhash, pack_signature
+from guest_likes import get_guest_likes
+from leaderboards import get_leaderboards, BOARDS
+from search import search_posts, index_post, remove_post
+from trending import event_score
 from http import HTTPStatus
+from sqlalchemy.exc import IntegrityError
 from config import Config
+from datetime import timezone
 import logging
-import os
 import re
-import json
-from openai import OpenAI
 
 posts = Blueprint('posts', __name__)
 
@@ -55,17 +65,22 @@ def create_post():
             content=data['content'],
             post_length=len(data['content']),
             post_type=data['post_type'],
-            user_id=current_user.id
+            user_id=current_user.id,
+            hot_score=event_score(Config.TRENDING_POST_WEIGHT)
         )
 
         cost = calculate_post_cost(data['post_type'], data['content'])
         
-        if current_user.points < cost:
+        # Checked and deducted in one UPDATE so parallel posts cannot overspend
+        if not spend_points(current_user.id, cost, 'post_created'):
+            db.session.rollback()
             error_msg = f'Puncte insuficiente. Ai nevoie de {cost} puncte pentru a crea această postare.'
             return handle_response(error_msg, HTTPStatus.BAD_REQUEST)
 
-        current_user.points -= cost
         db.session.add(post)
+        db.session.flush()
+        index_post(post)
+        bump_feed_generation()
         db.session.commit()
 
         success_msg = 'Postare creată cu succes!'
@@ -78,29 +93,69 @@ def create_post():
         logging.error(f"Error creating post: {str(e)}")
         return handle_response('A apărut o eroare la crearea postării', HTTPStatus.INTERNAL_SERVER_ERROR)
 
+# Conditional GET for the read endpoints. ETags are derived from Post.version
+# (bumped by counters.py on every change) or, for feed pages, from the key
+# columns of the page's rows (feed.py) without loading the payload, so a
+# client or a CDN revalidating an unchanged resource costs a small query or
+# two and gets an empty 304.
+
+def _http_time(value):
+    """Naive UTC timestamp as an aware datetime at HTTP-date (second) precision."""
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+def _not_modified(etag, last_modified=None):
+    """Whether the request's validators match. If-None-Match wins over If-Modified-Since."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(last_modified and since and last_modified <= since)
+
+def _conditional(response, etag, last_modified=None, cache=True):
+    """Attach validators and Cache-Control to a 200 or 304 response."""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    if cache:
+        # Shared caches may serve a copy briefly, then must revalidate (cheap with the ETag)
+        response.cache_control.public = True
+        response.cache_control.max_age = Config.API_CACHE_MAX_AGE
+        response.cache_control.stale_while_revalidate = Config.API_CACHE_STALE_WHILE_REVALIDATE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def _not_modified_response(etag, last_modified=None, cache=True):
+    return _conditional(current_app.response_class(status=HTTPStatus.NOT_MODIFIED), etag, last_modified, cache)
+
 @posts.route('/posts', methods=['GET'])
 def get_posts():
-    """Get paginated list of posts with filtering."""
+    """Get a cursor-paginated list of posts with filtering and sorting."""
     post_type = request.args.get('type')
-    page = request.args.get('page', 1, type=int)
+    sort = request.args.get('sort', 'recent')
+    cursor = request.args.get('cursor')
     per_page = request.args.get('per_page', 10, type=int)
 
-    query = Post.query
-    if post_type:
-        query = query.filter_by(post_type=post_type)
-
-    posts = query.order_by(Post.created_at.desc()).paginate(
-        page=page, 
-        per_page=per_page,
-        error_out=False
-    )
+    # The first page of the random sort draws a new seed every time, so it has no stable ETag
+    conditional = not (sort == 'random' and not cursor)
+    try:
+        if conditional:
+            tag, last_modified = feed_page_tag(post_type, sort, cursor, per_page)
+            etag = f'{Config.API_VERSION}-{tag}'
+            # Only the ETag is checked here: If-Modified-Since cannot see posts moving between pages
+            if request.if_none_match.contains(etag):
+                return _not_modified_response(etag)
+        posts, next_cursor = paginate_feed(post_type, sort, cursor, per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTPStatus.BAD_REQUEST
 
-    return jsonify({
-        'items': [serialize_post(post) for post in posts.items],
-        'total': posts.total,
-        'pages': posts.pages,
-        'current_page': posts.page
+    response = jsonify({
+        'items': [serialize_post(post) for post in posts],
+        'next_cursor': next_cursor
     })
+    if conditional:
+        return _conditional(response, etag, _http_time(last_modified))
+    response.cache_control.no_store = True
+    return response
 
 def serialize_post(post):
     """Serialize post data for JSON responses."""
@@ -111,14 +166,51 @@ def serialize_post(post):
         'post_type': post.post_type,
         'author': post.author.name,
         'created_at': post.created_at.isoformat(),
-        'comment_count': len(post.comments),
-        'like_count': len(post.likes)
+        'comment_count': post.comment_count,
+        'like_count': post.like_count,
+        'guest_like_count': post.guest_like_count
     }
 
+@posts.route('/search', methods=['GET'])
+def search():
+    """Full-text search over posts, best match first, with page/per_page pagination."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query'}), HTTPStatus.BAD_REQUEST
+    page = request.args.get('page', 1, type=int)
+    try:
+        posts, has_more = search_posts(
+            query, request.args.get('type'), page, request.args.get('per_page', 10, type=int)
+        )
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), HTTPStatus.SERVICE_UNAVAILABLE
+    return jsonify({
+        'items': [serialize_post(post) for post in posts],
+        'next_page': page + 1 if has_more else None
+    })
+
 @posts.route('/posts/<int:post_id>', methods=['GET'])
 def get_post(post_id):
     """Get detailed post data with comments."""
-    post = Post.query.get_or_404(post_id)
+    row = db.session.execute(
+        db.select(Post.created_at, Post.version, Post.updated_at).where(Post.id == post_id)
+    ).first()
+    if row is None:
+        abort(HTTPStatus.NOT_FOUND)
+    etag = f'{Config.API_VERSION}-{post_revision(post_id, row.created_at, row.version)}'
+    last_modified = _http_time(row.updated_at)
+    if _not_modified(etag, last_modified):
+        return _not_modified_response(etag, last_modified)
+
+    # Three queries however many comments: post with author, comments, comment authors
+    post = db.first_or_404(
+        db.select(Post)
+        .options(
+            db.joinedload(Post.author),
+            db.selectinload(Post.comments).selectinload(Comment.author)
+        )
+        .where(Post.id == post_id)
+    )
     
     comments_data = []
     for comment in post.comments:
@@ -132,11 +224,13 @@ def get_post(post_id):
             'created_at': comment.created_at.isoformat(),
             'ai_score': comment.ai_score,
             'ai_feedback': comment.ai_feedback,
-            'like_count': len(comment.likes),
+            'evaluation_status': comment.evaluation_status,
+            'like_count': comment.like_count,
+            'guest_like_count': comment.guest_like_count,
             'is_spam_copied': is_spam_copied
         })
     
-    return jsonify({
+    response = jsonify({
         'id': post.id,
         'title': post.title,
         'description': post.description,
@@ -144,133 +238,11 @@ def get_post(post_id):
         'post_type': post.post_type,
         'author': post.author.name,
         'created_at': post.created_at.isoformat(),
-        'like_count': len(post.likes),
+        'like_count': post.like_count,
+        'guest_like_count': post.guest_like_count,
         'comments': comments_data
     })
-
-def evaluate_comment_with_openai(content, post_type, post_content=None, post_title=None):
-    """Evaluate comment using OpenAI model."""
-    log_file_path = "ai_evaluation.log"
-    
-    try:
-        # Log the API key (masked) for debugging
-        openai_api_key = os.getenv('OPENAI_API_KEY')
-        masked_key = openai_api_key[:8] + "..." + openai_api_key[-4:] if openai_api_key and len(openai_api_key) > 12 else "***"
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"\nUsing OpenAI API key: {masked_key}\n")
-            f.write(f"Using OpenAI o3-mini model for evaluation\n")
-        
-        # Log the comment
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"Evaluating comment: {content}\n")
-            if post_content:
-                f.write(f"Post content: {post_content[:100]}...\n")
-            if post_title:
-                f.write(f"Post title: {post_title}\n")
-        
-        # Check for spam patterns first (quick check before API call)
-        spam_patterns = [
-            'http://', 'https://', 'www.', '.com', '.net', '.org',  # URLs
-            'viagra', 'cialis', 'buy now', 'discount', 'free offer',  # Common spam words
-            'casino', 'lottery', 'winner', 'prize', 'money',  # More spam words
-        ]
-        
-        # Check if comment contains spam patterns
-        contains_spam = any(pattern in content.lower() for pattern in spam_patterns)
-        
-        # Log spam check
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"Initial spam check: {contains_spam}\n")
-        
-        if contains_spam:
-            with open(log_file_path, "a", encoding='utf-8') as f:
-                f.write(f"Comment flagged as spam, skipping API call\n")
-            return 0, True, "Comment contains spam patterns"
-        
-        # Prepare the prompt for OpenAI
-        system_prompt = """You are an expert literary critic and community moderator for a Romanian literary platform. 
-Your task is to evaluate comments on literary works based on:
-1. Relevance to the original post
-2. Literary insight and value
-3. Constructive feedback
-4. Thoughtfulness and depth
-5. Appropriate tone and language
-
-Rate the comment on a scale of 0-100, where:
-0-20: Spam, irrelevant, or inappropriate
-21-40: Minimal effort, generic, or superficial
-41-60: Adequate but lacks depth or insight
-61-80: Good quality with relevant insights
-81-100: Exceptional literary analysis with depth and originality
-
-Also determine if the comment is spam or copied content (yes/no).
-
-Provide your evaluation in JSON format:
-{
-  "score": [0-100],
-  "is_spam_or_copied": [true/false],
-  "reasoning": "[brief explanation of your evaluation]"
-}"""
-
-        user_prompt = f"Original Post Type: {post_type}\n"
-        if post_title:
-            user_prompt += f"Original Post Title: {post_title}\n"
-        if post_content:
-            user_prompt += f"Original Post Content: {post_content}\n"
-        user_prompt += f"Comment to Evaluate: {content}"
-        
-        # Log the prompts
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"System prompt: {system_prompt}\n")
-            f.write(f"User prompt: {user_prompt}\n")
-        
-        # Initialize OpenAI client
-        client = OpenAI(api_key=openai_api_key)
-        
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        # Extract the response
-        response_content = response.choices[0].message.content
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"OpenAI response: {response_content}\n")
-        
-        # Parse the JSON response
-        evaluation = json.loads(response_content)
-        
-        score = int(evaluation.get("score", 0))
-        is_spam_copied = evaluation.get("is_spam_or_copied", False)
-        reasoning = evaluation.get("reasoning", "No reasoning provided")
-        
-        # Log the evaluation
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"Parsed evaluation - Score: {score}, Is spam/copied: {is_spam_copied}\n")
-            f.write(f"Reasoning: {reasoning}\n")
-        
-        # Return the score, whether it's spam or copied, and the reasoning
-        return score, is_spam_copied, reasoning
-
-    except Exception as e:
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"ERROR in evaluate_comment_with_openai: {str(e)}\n")
-            import traceback
-            f.write(f"Traceback: {traceback.format_exc()}\n")
-        logging.error(f"OpenAI evaluation error: {e}")
-        return 0, False, "Error evaluating comment"
-
-def evaluate_comment(content, post_type):
-    """Evaluate comment using OpenAI API."""
-    # This is a legacy function that doesn't include post context
-    # It should return three values to match the new signature
-    score, is_spam_copied, reasoning = evaluate_comment_with_openai(content, post_type)
-    return score, is_spam_copied, reasoning
+    return _conditional(response, etag, last_modified)
 
 @posts.route('/posts/<int:post_id>/comments', methods=['POST'])
 @login_required
@@ -285,107 +257,55 @@ def add_comment(post_id):
         # Validate comment length
         Comment.validate_content(data['content'])
         
-        # Log the comment attempt
-        log_file_path = "ai_evaluation.log"
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"\nNew comment attempt on post {post_id}: {data['content']}\n")
-
-        # Evaluate comment using AI with post context
-        score, is_spam_copied, reasoning = evaluate_comment_with_openai(
-            content=data['content'], 
-            post_type=post.post_type,
-            post_content=post.content,
-            post_title=post.title
-        )
-        
-        # Log the score
-        with open(log_file_path, "a", encoding='utf-8') as f:
-            f.write(f"AI score: {score}, is_spam_copied: {is_spam_copied}\n")
-        
-        # Set minimum scores based on comment length and content
-        if not is_spam_copied:
-            # Calculate comment length in words
-            word_count = len(data['content'].split())
-            
-            # Log the word count
-            with open(log_file_path, "a", encoding='utf-8') as f:
-                f.write(f"Comment word count: {word_count}\n")
-            
-            # If the AI evaluation failed or returned 0, set a minimum score based on length
-            if score == 0:
-                if word_count > 200:  # Very long, detailed comment
-                    score = 80
-                    with open(log_file_path, "a", encoding='utf-8') as f:
-                        f.write(f"Setting score to 80 for very long comment ({word_count} words)\n")
-                elif word_count > 100:  # Long comment
-                    score = 60
-                    with open(log_file_path, "a", encoding='utf-8') as f:
-                        f.write(f"Setting score to 60 for long comment ({word_count} words)\n")
-                elif word_count > 50:  # Medium comment
-                    score = 40
-                    with open(log_file_path, "a", encoding='utf-8') as f:
-                        f.write(f"Setting score to 40 for medium comment ({word_count} words)\n")
-                elif word_count > 20:  # Short but substantial comment
-                    score = 20
-                    with open(log_file_path, "a", encoding='utf-8') as f:
-                        f.write(f"Setting score to 20 for short comment ({word_count} words)\n")
-                else:  # Very short comment
-                    score = 10
-                    with open(log_file_path, "a", encoding='utf-8') as f:
-                        f.write(f"Setting score to 10 for very short comment ({word_count} words)\n")
-            
-            # Ensure minimum scores based on length even if AI gave a lower score
-            if word_count > 200 and score < 60:
-                score = 60
-                with open(log_file_path, "a", encoding='utf-8') as f:
-                    f.write(f"Increasing score to minimum 60 for very long comment\n")
-            elif word_count > 100 and score < 40:
-                score = 40
-                with open(log_file_path, "a", encoding='utf-8') as f:
-                    f.write(f"Increasing score to minimum 40 for long comment\n")
-            elif word_count > 50 and score < 20:
-                score = 20
-                with open(log_file_path, "a", encoding='utf-8') as f:
-                    f.write(f"Increasing score to minimum 20 for medium comment\n")
+        # Look for copies of earlier comments locally before paying for an AI evaluation
+        signature = minhash(data['content'])
+        duplicate_index = get_duplicate_index()
+        duplicate = None
+        if len(data['content'].split()) >= Config.DUPLICATE_MIN_WORDS:
+            duplicate = duplicate_index.find(signature, post_id)
         
+        # Store the comment right away; the AI score and points are settled
+        # by the background evaluation queue
         comment = Comment(
             content=data['content'],
             comment_length=len(data['content']),
             user_id=current_user.id,
             post_id=post_id,
-            ai_score=int(score),
-            ai_feedback=reasoning
+            minhash=pack_signature(signature) if signature else None,
+            evaluation_status='pending'
         )
-        
-        # Award points based on AI score and quality thresholds
-        if score == 0 or is_spam_copied:
-            points_awarded = 0
-        elif score <= Config.COMMENT_QUALITY_THRESHOLDS['low']:
-            points_awarded = Config.COMMENT_QUALITY_REWARDS['low']
-        elif score <= Config.COMMENT_QUALITY_THRESHOLDS['medium']:
-            points_awarded = Config.COMMENT_QUALITY_REWARDS['medium']
-        else:
-            points_awarded = Config.COMMENT_QUALITY_REWARDS['high']
-        
-        current_user.points += points_awarded
+        if duplicate:
+            duplicate_id, similarity, same_post = duplicate
+            comment.ai_score = 0
+            comment.ai_feedback = (
+                f"Comentariu copiat ({similarity:.0%} identic cu comentariul #{duplicate_id}"
+                f"{' de la aceeași postare' if same_post else ''})"
+            )
+            comment.evaluation_status = 'done'
+        record_comment(post, 1)
         
         db.session.add(comment)
+        db.session.flush()
+        duplicate_index.add(comment.id, signature)
         db.session.commit()
         
-        if is_spam_copied:
+        if duplicate:
             return jsonify({
                 'message': 'Comment added successfully',
                 'comment_id': comment.id,
+                'evaluation_status': 'done',
                 'warning': "Acest comentariu a fost marcat ca spam sau a fost copiat un comentariu anterior",
-                'points_awarded': points_awarded
-            }), HTTPStatus.CREATED
-        else:
-            return jsonify({
-                'message': 'Comment added successfully',
-                'comment_id': comment.id,
-                'ai_score': int(score),
-                'points_awarded': points_awarded
+                'points_awarded': 0
             }), HTTPStatus.CREATED
+        
+        get_evaluation_queue().submit(comment.id)
+        
+        return jsonify({
+            'message': 'Comment added successfully',
+            'comment_id': comment.id,
+            'evaluation_status': 'pending',
+            'status_url': url_for('posts.comment_evaluation', comment_id=comment.id)
+        }), HTTPStatus.ACCEPTED
 
     except ValueError as e:
         return jsonify({'error': str(e)}), HTTPStatus.BAD_REQUEST
@@ -394,6 +314,78 @@ def add_comment(post_id):
         logging.error(f"Error adding comment: {str(e)}")
         return jsonify({'error': 'Failed to add comment'}), HTTPStatus.INTERNAL_SERVER_ERROR
 
+@posts.route('/comments/<int:comment_id>/evaluation', methods=['GET'])
+def comment_evaluation(comment_id):
+    """Report the AI evaluation state of a comment so the page can poll for it."""
+    comment = Comment.query.get_or_404(comment_id)
+    response = {
+        'comment_id': comment.id,
+        'evaluation_status': comment.evaluation_status
+    }
+    if comment.evaluation_status == 'done':
+        response.update({
+            'ai_score': comment.ai_score,
+            'ai_feedback': comment.ai_feedback,
+            'is_spam_copied': comment.ai_score == 0,
+            'points_awarded': points_for_score(comment.ai_score)
+        })
+    return jsonify(response)
+
+@posts.route('/evaluation/cache', methods=['GET'])
+def evaluation_cache_stats():
+    """Hit/miss counters of the AI evaluation cache for this process."""
+    stats = get_evaluation_queue().cache.stats()
+    stats['post_context'] = post_contexts.stats()
+    return jsonify(stats)
+
+@posts.route('/fragments/cache', methods=['GET'])
+def fragment_cache_stats():
+    """Hit ratios of the rendered-fragment cache for this process."""
+    return jsonify(get_fragment_cache().stats())
+
+@posts.route('/leaderboards', methods=['GET'])
+def leaderboards():
+    """Top authors by points, likes received, post count and comment quality.
+
+    ?board= limits the response to one board, ?limit= to the first entries of each.
+    """
+    board = request.args.get('board')
+    if board is not None and board not in BOARDS:
+        return jsonify({'error': f'Unknown leaderboard: {board}'}), HTTPStatus.BAD_REQUEST
+    limit = min(max(request.args.get('limit', 10, type=int), 1), Config.LEADERBOARD_SIZE)
+
+    tops = {name: get_leaderboards().top(name, limit) for name in ([board] if board else BOARDS)}
+    user_ids = {user_id for top in tops.values() for user_id, _ in top}
+    users = {
+        row.id: row for row in db.session.execute(
+            db.select(User.id, User.name, User.profile_picture).where(User.id.in_(user_ids))
+        )
+    }
+    return jsonify({
+        name: [
+            {
+                'rank': rank,
+                'user_id': user_id,
+                'name': users[user_id].name,
+                'profile_picture': users[user_id].profile_picture,
+                'score': score
+            }
+            for rank, (user_id, score) in enumerate(top, 1) if user_id in users
+        ]
+        for name, top in tops.items()
+    })
+
+@posts.route('/leaderboards/stats', methods=['GET'])
+def leaderboard_stats():
+    """Freshness of the leaderboards held by this process."""
+    return jsonify(get_leaderboards().stats())
+
+@posts.route('/evaluation/llm', methods=['GET'])
+def evaluation_llm_stats():
+    """Circuit breaker state and call latency of the LLM client in this process."""
+    client = peek_llm_client()
+    return jsonify(client.stats() if client else {'state': 'idle'})
+
 @posts.route('/posts/<int:post_id>', methods=['DELETE'])
 @login_required
 def delete_post(post_id):
@@ -402,6 +394,10 @@ def delete_post(post_id):
         return jsonify({'error': 'You are not authorized to delete this post'}), HTTPStatus.FORBIDDEN
     
     try:
+        record_post_deleted(post)
+        bump_feed_generation()
+        remove_post(post.id)
+        get_duplicate_index().remove_post(post.id)
         db.session.delete(post)
         db.session.commit()
         return jsonify({'message': 'Post deleted successfully'}), HTTPStatus.NO_CONTENT
@@ -410,51 +406,85 @@ def delete_post(post_id):
         logging.error(f"Error deleting post: {str(e)}")
         return jsonify({'error': 'Failed to delete post'}), HTTPStatus.INTERNAL_SERVER_ERROR
 
+def _requested_like_state():
+    """The 'liked' flag of the request body: True/False sets that state, None toggles."""
+    data = request.get_json(silent=True) or {}
+    liked = data.get('liked')
+    return liked if isinstance(liked, bool) else None
+
+def apply_like(user_id, liked=None, **target):
+    """Like or unlike a post/comment for a user, safe against concurrent requests.
+
+    target is post_id=... or comment_id=.... Returns (delta, liked_at): the
+    change in likes, +1, -1, or 0 when the request changed nothing (already
+    in the requested state, or a concurrent request got there first), and for
+    -1 when the removed like was given. The unique indexes on Like make the
+    database the arbiter instead of a read-then-write.
+    """
+    if liked is not True:
+        # One statement, so only the request that removed the like gets its time back
+        liked_at = db.session.execute(
+            db.delete(Like).filter_by(user_id=user_id, **target).returning(Like.created_at),
+            execution_options={'synchronize_session': False}
+        ).first()
+        if liked_at is not None:
+            return -1, liked_at[0]
+        if liked is False:
+            return 0, None
+    try:
+        with db.session.begin_nested():
+            db.session.add(Like(user_id=user_id, **target))
+    except IntegrityError:
+        return 0, None
+    return 1, None
+
+def _displayed_post_likes(post):
+    # The like buttons show member and guest likes together, including guest likes not yet flushed
+    return post.like_count + post.guest_like_count + get_guest_likes().pending_for_post(post.id)
+
+def _displayed_comment_likes(comment):
+    return comment.like_count + comment.guest_like_count + get_guest_likes().pending_for_comment(comment.id)
+
+def _is_liked(user_id, **target):
+    return db.session.scalar(db.select(db.exists().where(
+        *(getattr(Like, column) == value for column, value in {'user_id': user_id, **target}.items())
+    )))
+
 @posts.route('/posts/<int:post_id>/like', methods=['POST'])
 def like_post(post_id):
+    """Toggle the current user's like, or set it with {"liked": true/false} (idempotent)."""
     post = Post.query.get_or_404(post_id)
     
     # Check if user is authenticated
     if current_user.is_authenticated:
-        like = Like.query.filter_by(user_id=current_user.id, post_id=post_id).first()
-        
         try:
-            if like:
-                # User is unliking the post
-                db.session.delete(like)
-                
-                # Remove points from both the liker and post author
-                current_user.points -= Config.LIKE_GIVEN_REWARD  # Remove points for giving a like
-                post.author.points -= Config.POST_LIKE_REWARD    # Remove points from post author
-            else:
-                # User is liking the post
-                like = Like(user_id=current_user.id, post_id=post_id)
-                db.session.add(like)
-                
-                # Award points to both the liker and post author
-                current_user.points += Config.LIKE_GIVEN_REWARD  # Award points for giving a like
-                post.author.points += Config.POST_LIKE_REWARD    # Award points to post author
+            liked = _requested_like_state()
+            delta, liked_at = apply_like(current_user.id, liked, post_id=post_id)
+            if delta:
+                record_post_like(post, delta, liked_at)
+                # Points for giving the like and for the post author receiving it
+                add_points(current_user.id, delta * Config.LIKE_GIVEN_REWARD, 'post_like_given', post_id)
+                add_points(post.user_id, delta * Config.POST_LIKE_REWARD, 'post_liked', post_id)
                 
             db.session.commit()
-            # Refresh the post object to get the updated likes
+            # Refresh the post object to get the updated counter
             db.session.refresh(post)
             return jsonify({
                 'message': 'Post like toggled successfully',
-                'like_count': len(post.likes)
+                'like_count': _displayed_post_likes(post),
+                'liked': delta > 0 if delta else _is_liked(current_user.id, post_id=post_id)
             }), HTTPStatus.OK
         except Exception as e:
             db.session.rollback()
             logging.error(f"Error toggling post like: {str(e)}")
             return jsonify({'error': 'Failed to toggle post like'}), HTTPStatus.INTERNAL_SERVER_ERROR
     else:
-        # Guest like
+        # Guest like: buffered and written with other guest likes in one batch
         try:
-            # For guest likes, we just increment the author's points
-            post.author.points += Config.POST_LIKE_REWARD
-            db.session.commit()
+            get_guest_likes().add_post_like(post)
             return jsonify({
                 'message': 'Guest like added successfully',
-                'like_count': len(post.likes) + 1  # Add 1 for the guest like (not stored in DB)
+                'like_count': _displayed_post_likes(post)
             }), HTTPStatus.OK
         except Exception as e:
             db.session.rollback()
@@ -463,49 +493,39 @@ def like_post(post_id):
 
 @posts.route('/comments/<int:comment_id>/like', methods=['POST'])
 def like_comment(comment_id):
+    """Toggle the current user's like, or set it with {"liked": true/false} (idempotent)."""
     comment = Comment.query.get_or_404(comment_id)
     
     # Check if user is authenticated
     if current_user.is_authenticated:
-        like = Like.query.filter_by(user_id=current_user.id, comment_id=comment_id).first()
-        
         try:
-            if like:
-                # User is unliking the comment
-                db.session.delete(like)
-                
-                # Remove points from both the liker and comment author
-                current_user.points -= Config.LIKE_GIVEN_REWARD     # Remove points for giving a like
-                comment.author.points -= Config.COMMENT_LIKE_REWARD  # Remove points from comment author
-            else:
-                # User is liking the comment
-                like = Like(user_id=current_user.id, comment_id=comment_id)
-                db.session.add(like)
-                
-                # Award points to both the liker and comment author
-                current_user.points += Config.LIKE_GIVEN_REWARD     # Award points for giving a like
-                comment.author.points += Config.COMMENT_LIKE_REWARD  # Award points to comment author
+            liked = _requested_like_state()
+            delta, _ = apply_like(current_user.id, liked, comment_id=comment_id)
+            if delta:
+                record_comment_like(comment, delta)
+                # Points for giving the like and for the comment author receiving it
+                add_points(current_user.id, delta * Config.LIKE_GIVEN_REWARD, 'comment_like_given', comment_id)
+                add_points(comment.user_id, delta * Config.COMMENT_LIKE_REWARD, 'comment_liked', comment_id)
                 
             db.session.commit()
-            # Refresh the comment object to get the updated likes
+            # Refresh the comment object to get the updated counter
             db.session.refresh(comment)
             return jsonify({
                 'message': 'Comment like toggled successfully',
-                'like_count': len(comment.likes)
+                'like_count': _displayed_comment_likes(comment),
+                'liked': delta > 0 if delta else _is_liked(current_user.id, comment_id=comment_id)
             }), HTTPStatus.OK
         except Exception as e:
             db.session.rollback()
             logging.error(f"Error toggling comment like: {str(e)}")
             return jsonify({'error': 'Failed to toggle comment like'}), HTTPStatus.INTERNAL_SERVER_ERROR
     else:
-        # Guest like
+        # Guest like: buffered and written with other guest likes in one batch
         try:
-            # For guest likes, we just increment the author's points
-            comment.author.points += Config.COMMENT_LIKE_REWARD
-            db.session.commit()
+            get_guest_likes().add_comment_like(comment)
             return jsonify({
                 'message': 'Guest like added successfully',
-                'like_count': len(comment.likes) + 1  # Add 1 for the guest like (not stored in DB)
+                'like_count': _displayed_comment_likes(comment)
             }), HTTPStatus.OK
         except Exception as e:
             db.session.rollback()
@@ -520,22 +540,29 @@ def delete_comment(comment_id):
         return jsonify({'error': 'You are not authorized to delete this comment'}), HTTPStatus.FORBIDDEN
     
     try:
+        # Take a pending comment away from the evaluation queue first, so its
+        # conditional update matches nothing and pays nothing. This write also
+        # locks the row, so a score committed just before is seen by refresh()
+        db.session.execute(
+            db.update(Comment)
+            .where(Comment.id == comment_id, Comment.evaluation_status == 'pending')
+            .values(evaluation_status='deleted'),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.refresh(comment)
+
         # Calculate points to remove based on AI score and quality thresholds
-        points_to_remove = 0
-        if comment.ai_score > 0:  # Only remove points if the comment wasn't marked as spam
-            if comment.ai_score <= Config.COMMENT_QUALITY_THRESHOLDS['low']:
-                points_to_remove = Config.COMMENT_QUALITY_REWARDS['low']
-            elif comment.ai_score <= Config.COMMENT_QUALITY_THRESHOLDS['medium']:
-                points_to_remove = Config.COMMENT_QUALITY_REWARDS['medium']
-            else:
-                points_to_remove = Config.COMMENT_QUALITY_REWARDS['high']
+        # (pending comments have not been awarded anything yet)
+        points_to_remove = points_for_score(comment.ai_score)
         
         # Remove points from user
         if points_to_remove > 0:
-            current_user.points = max(0, current_user.points - points_to_remove)
+            add_points(current_user.id, -points_to_remove, 'comment_deleted', comment_id, floor=0)
             logging.info(f"Removed {points_to_remove} points from user {current_user.id} for deleting comment {comment_id}")
         
         # Delete the comment
+        record_comment(comment.post, -1, comment)
+        get_duplicate_index().remove(comment_id)
         db.session.delete(comment)
         db.session.commit()
         
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from config import Config
+
+# Per-post prompt context for AI evaluations. The post part of the prompt
+# (type, title and a length-bounded excerpt of the content) is the same for
+# every comment on a post, so it is built once and kept in a small LRU keyed
+# by a fingerprint of the post. An edited post gets a new fingerprint, so
+# stale contexts are never used. The excerpt is cut to a token budget,
+# keeping the opening and the ending of long stories and plays.
+
+PreparedContext = namedtuple('PreparedContext', ['prefix', 'full_tokens', 'prefix_tokens'])
+
+EXCERPT_GAP = '\n[...]\n'
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for Romanian/English prose)."""
+    return -(-len(text) // Config.PROMPT_CHARS_PER_TOKEN) if text else 0
+
+def bounded_excerpt(text, budget_tokens):
+    """Return text unchanged if it fits the budget, else its head and tail joined by a gap marker."""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    budget_chars = budget_tokens * Config.PROMPT_CHARS_PER_TOKEN - len(EXCERPT_GAP)
+    head_chars = int(budget_chars * 0.7)
+    tail_chars = budget_chars - head_chars
+
+    # Cut on whitespace so words (and, ideally, verses) are not split
+    head = text[:head_chars]
+    cut = max(head.rfind('\n'), head.rfind(' '))
+    if cut > head_chars // 2:
+        head = head[:cut]
+    tail = text[-tail_chars:]
+    cut = min((i for i in (tail.find('\n'), tail.find(' ')) if i >= 0), default=-1)
+    if 0 <= cut < tail_chars // 2:
+        tail = tail[cut + 1:]
+    return head.rstrip() + EXCERPT_GAP + tail.lstrip()
+
+def _build_prefix(post_type, post_title, post_content):
+    prefix = f"Original Post Type: {post_type}\n"
+    if post_title:
+        prefix += f"Original Post Title: {post_title}\n"
+    full_tokens = estimate_tokens(prefix)
+    if post_content:
+        excerpt = bounded_excerpt(post_content, Config.PROMPT_POST_TOKEN_BUDGET)
+        prefix += f"Original Post Content: {excerpt}\n"
+        full_tokens += estimate_tokens(f"Original Post Content: {post_content}\n")
+    return PreparedContext(prefix=prefix, full_tokens=full_tokens, prefix_tokens=estimate_tokens(prefix))
+
+class PostContextCache:
+    """LRU of PreparedContext by post fingerprint, with hit and token-savings counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prompts = 0
+        self.tokens_saved = 0
+
+    def prepare(self, post_type, post_title, post_content):
+        """Return the PreparedContext for a post, building it on a miss."""
+        key = hashlib.sha1(
+            f'{post_type}\x00{post_title or ""}\x00{post_content or ""}'.encode('utf-8')
+        ).hexdigest()
+        with self._lock:
+            context = self._entries.get(key)
+            if context is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return context
+
+        context = _build_prefix(post_type, post_title, post_content)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = context
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return context
+
+    def record_prompt(self, context):
+        """Count one prompt sent with this context and the tokens the excerpt saved."""
+        with self._lock:
+            self.prompts += 1
+            self.tokens_saved += context.full_tokens - context.prefix_tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'prompts': self.prompts,
+                'prompt_tokens_saved': self.tokens_saved,
+                'prompt_tokens_saved_per_call': round(self.tokens_saved / self.prompts, 1) if self.prompts else 0.0
+            }
+
+post_contexts = PostContextCache(Config.POST_CONTEXT_CACHE_SIZE)
+
+def build_user_prompt(content, post_type, post_content=None, post_title=None, context=None):
+    """User prompt with the cached post prefix first and the comment last.
+
+    Pass context when it was already prepared for this post, so the cache
+    counts one lookup per evaluation. Returns (prompt, PreparedContext).
+    """
+    if context is None:
+        context = post_contexts.prepare(post_type, post_title, post_content)
+    post_contexts.record_prompt(context)
+    return context.prefix + f"Comment to Evaluate: {content}", context
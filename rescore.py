@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from models import db, User, Post, Comment
+from evaluation import get_evaluation_queue, settle_evaluation, points_for_score, EVALUATORS
+from counters import touch_posts
+from ledger import record_points_many, paid_by_ref
+
+# Bulk re-scoring of existing comments, e.g. after a prompt or threshold
+# change. Comments are streamed in id order, one chunk at a time; each chunk
+# is evaluated on a thread pool under a global rate limit, written back with
+# one conditional UPDATE per comment together with the point corrections (and
+# their ledger events), and then the last
+# processed id is saved to a checkpoint file so an interrupted run resumes.
+#
+# A correction is the new payout minus what the comment's score has already
+# paid according to the ledger, not minus the old score's payout under the
+# current thresholds, which may be the very thing that changed. Comments that
+# were changed or deleted while being evaluated are left alone.
+
+# Ledger reasons of the points paid for a comment's score
+SCORE_REASONS = ('comment_scored', 'rescore')
+
+class RateLimiter:
+    """Spaces calls evenly so that at most `rate` happen per second across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'last_id': 0, 'processed': 0}
+
+def save_checkpoint(path, state):
+    # Write to a temporary file and rename so a crash never leaves half a checkpoint
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def _evaluate_row(app, evaluation_queue, evaluator, limiter, row):
+    comment_id, content, user_id, old_score, post_id, post_type, post_content, post_title = row
+    event = {'comment_id': comment_id, 'post_id': post_id, 'rescore': True}
+    with app.app_context():
+        limiter.wait()
+        result = evaluation_queue.evaluate(content, post_id, post_type, post_content, post_title, event, evaluator)
+        # The evaluation cache row is written in this thread's session
+        db.session.commit()
+    score, reasoning, points = settle_evaluation(result, content, event)
+    return {
+        'id': comment_id,
+        'user_id': user_id,
+        'old_score': old_score,
+        'ai_score': score,
+        'ai_feedback': reasoning,
+        'points': points
+    }
+
+def _write_score(result):
+    old_score = result['old_score']
+    return db.session.execute(
+        db.update(Comment)
+        .where(
+            Comment.id == result['id'],
+            Comment.evaluation_status == 'done',
+            Comment.ai_score.is_(None) if old_score is None else Comment.ai_score == old_score
+        )
+        .values(ai_score=result['ai_score'], ai_feedback=result['ai_feedback']),
+        execution_options={'synchronize_session': False}
+    ).rowcount > 0
+
+def rescore_comments(app, evaluator=None, concurrency=4, rate=None, chunk_size=200,
+                     checkpoint_path=None, restart=False, include_flagged=False, echo=print):
+    """Re-evaluate comments in id order. Returns (processed, elapsed seconds)."""
+    evaluation_queue = get_evaluation_queue()
+    if isinstance(evaluator, str):
+        evaluator = EVALUATORS[evaluator]
+    limiter = RateLimiter(rate)
+
+    state = {'last_id': 0, 'processed': 0} if restart else load_checkpoint(checkpoint_path)
+    if state['last_id']:
+        echo(f"Resuming after comment {state['last_id']} ({state['processed']} already processed)")
+
+    started = time.perf_counter()
+    processed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            query = (
+                db.select(
+                    Comment.id, Comment.content, Comment.user_id, Comment.ai_score,
+                    Post.id, Post.post_type, Post.content, Post.title
+                )
+                .join(Post, Comment.post_id == Post.id)
+                .where(Comment.id > state['last_id'])
+                # Pending comments belong to the live evaluation queue, which pays their points
+                .where(Comment.evaluation_status == 'done')
+            )
+            if not include_flagged:
+                # Spam and locally detected copies keep their zero score
+                query = query.where(db.or_(Comment.ai_score.is_(None), Comment.ai_score != 0))
+            rows = db.session.execute(query.order_by(Comment.id).limit(chunk_size)).all()
+            if not rows:
+                break
+
+            results = list(pool.map(
+                lambda row: _evaluate_row(app, evaluation_queue, evaluator, limiter, row), rows
+            ))
+
+            # Without ledger events (bulk loads, pruned ledgers) the old score's payout is the best guess
+            paid = paid_by_ref([r['id'] for r in results], SCORE_REASONS)
+            for r in results:
+                r['points_delta'] = r['points'] - paid.get(r['id'], points_for_score(r['old_score']))
+
+            # Written only if the comment still exists with the score it was read with
+            results = [r for r in results if _write_score(r)]
+            # One executemany for the point corrections
+            deltas = {}
+            for r in results:
+                deltas[r['user_id']] = deltas.get(r['user_id'], 0) + r['points_delta']
+            deltas = [{'uid': user_id, 'delta': delta} for user_id, delta in deltas.items() if delta]
+            if deltas:
+                users = User.__table__
+                db.session.execute(
+                    users.update()
+                    .where(users.c.id == db.bindparam('uid'))
+                    .values(points=users.c.points + db.bindparam('delta')),
+                    deltas
+                )
+                record_points_many([
+                    {'user_id': r['user_id'], 'delta': r['points_delta'], 'reason': 'rescore', 'ref_id': r['id']}
+                    for r in results if r['points_delta']
+                ])
+            touch_posts({row[4] for row in rows})
+            db.session.commit()
+
+            processed += len(rows)
+            state = {'last_id': rows[-1][0], 'processed': state['processed'] + len(rows)}
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, state)
+
+            elapsed = time.perf_counter() - started
+            echo(f"Rescored {processed} comments up to id {state['last_id']} "
+                 f"({processed / elapsed:.1f} comments/s)")
+
+    elapsed = time.perf_counter() - started
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return processed, elapsed
@@ -0,0 +1,206 @@
+import logging
+import re
+import unicodedata
+from flask import current_app
+from models import db, Post
+from config import Config
+
+# Full-text search over post titles, descriptions and contents. The index
+# lives in a post_search table next to post: an FTS5 virtual table on SQLite,
+# a tsvector column with a GIN index on PostgreSQL. Text is folded in Python
+# before it is indexed or searched (lowercase, no diacritics, so "ţară",
+# "țară" and "tara" all match), which keeps both backends on the plain
+# 'unicode61' / 'simple' configurations. Every query word is matched as a
+# prefix and all words must match. Rows are written in the same transaction
+# as the post (index_post / remove_post), and `flask rebuild-search-index`
+# rebuilds the whole index in batches.
+
+def fold(text):
+    """Lowercase text without diacritics; covers ă â î ș ț and the legacy cedilla forms ş ţ."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def query_terms(query):
+    """Folded words of a search query, at most SEARCH_MAX_TERMS."""
+    return re.findall(r'\w+', fold(query))[:Config.SEARCH_MAX_TERMS]
+
+def _document(post):
+    return {
+        'id': post.id,
+        'title': fold(post.title),
+        'description': fold(post.description),
+        'content': fold(post.content)
+    }
+
+class SQLiteSearch:
+    """FTS5 table keyed by rowid = post id, ranked with bm25 (title weighs most)."""
+
+    def create(self):
+        db.session.execute(db.text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS post_search "
+            "USING fts5(title, description, content, tokenize='unicode61')"
+        ))
+
+    def remove(self, post_ids):
+        db.session.execute(
+            db.text("DELETE FROM post_search WHERE rowid = :id"), [{'id': post_id} for post_id in post_ids]
+        )
+
+    def index(self, documents):
+        # FTS5 has no upsert: replace rows by deleting them first
+        self.remove([document['id'] for document in documents])
+        db.session.execute(
+            db.text(
+                "INSERT INTO post_search (rowid, title, description, content) "
+                "VALUES (:id, :title, :description, :content)"
+            ),
+            documents
+        )
+
+    def clear(self):
+        db.session.execute(db.text("DELETE FROM post_search"))
+
+    def search(self, terms, post_type, limit, offset):
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        return db.session.execute(
+            db.text(
+                "SELECT post_search.rowid FROM post_search JOIN post ON post.id = post_search.rowid "
+                "WHERE post_search MATCH :match AND (:post_type IS NULL OR post.post_type = :post_type) "
+                "ORDER BY bm25(post_search, 10.0, 4.0, 1.0), post.id DESC LIMIT :limit OFFSET :offset"
+            ),
+            {'match': match, 'post_type': post_type, 'limit': limit, 'offset': offset}
+        ).scalars().all()
+
+class PostgresSearch:
+    """tsvector per post with weights A (title), B (description) and C (content), under a GIN index."""
+
+    def create(self):
+        db.session.execute(db.text(
+            "CREATE TABLE IF NOT EXISTS post_search ("
+            "post_id INTEGER PRIMARY KEY REFERENCES post (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        ))
+        db.session.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_post_search_document ON post_search USING GIN (document)"
+        ))
+
+    def remove(self, post_ids):
+        db.session.execute(
+            db.text("DELETE FROM post_search WHERE post_id = ANY(:ids)"), {'ids': list(post_ids)}
+        )
+
+    def index(self, documents):
+        db.session.execute(
+            db.text(
+                "INSERT INTO post_search (post_id, document) VALUES (:id, "
+                "setweight(to_tsvector('simple', :title), 'A') || "
+                "setweight(to_tsvector('simple', :description), 'B') || "
+                "setweight(to_tsvector('simple', :content), 'C')) "
+                "ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document"
+            ),
+            documents
+        )
+
+    def clear(self):
+        db.session.execute(db.text("TRUNCATE post_search"))
+
+    def search(self, terms, post_type, limit, offset):
+        # Terms are \w+ only, so they cannot carry tsquery operators
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return db.session.execute(
+            db.text(
+                "SELECT s.post_id FROM post_search s JOIN post p ON p.id = s.post_id, "
+                "to_tsquery('simple', :tsquery) q "
+                "WHERE s.document @@ q AND (CAST(:post_type AS TEXT) IS NULL OR p.post_type = :post_type) "
+                "ORDER BY ts_rank(s.document, q) DESC, p.id DESC LIMIT :limit OFFSET :offset"
+            ),
+            {'tsquery': tsquery, 'post_type': post_type, 'limit': limit, 'offset': offset}
+        ).scalars().all()
+
+BACKENDS = {
+    'sqlite': SQLiteSearch,
+    'postgresql': PostgresSearch
+}
+
+def _backend():
+    return current_app.extensions.get('search')
+
+def index_post(post):
+    """Add or refresh a post in the search index. The post must have an id; does not commit."""
+    backend = _backend()
+    if backend is not None:
+        backend.index([_document(post)])
+
+def remove_post(post_id):
+    """Drop a post from the search index. Does not commit."""
+    backend = _backend()
+    if backend is not None:
+        backend.remove([post_id])
+
+def search_posts(query, post_type=None, page=1, per_page=None):
+    """Return (posts, has_more) for one page of results, best match first.
+
+    Raises RuntimeError if this database has no search backend.
+    """
+    backend = _backend()
+    if backend is None:
+        raise RuntimeError('Search is not available on this database')
+    per_page = max(1, min(per_page or Config.FEED_PAGE_SIZE, Config.FEED_MAX_PAGE_SIZE))
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    # One extra id tells whether there is a next page
+    post_ids = backend.search(terms, post_type, per_page + 1, (max(page, 1) - 1) * per_page)
+    has_more = len(post_ids) > per_page
+    post_ids = post_ids[:per_page]
+    posts = Post.query.options(
+        db.defer(Post.content),
+        db.undefer(Post.excerpt),
+        db.selectinload(Post.author)
+    ).filter(Post.id.in_(post_ids)).all()
+    posts.sort(key=lambda post: post_ids.index(post.id))
+    return posts, has_more
+
+def rebuild_search_index(chunk_size=1000, echo=None):
+    """Re-index every post in id order, chunk_size posts per statement. Returns the number indexed.
+
+    The caller commits.
+    """
+    backend = _backend()
+    if backend is None:
+        raise RuntimeError('Search is not available on this database')
+    backend.clear()
+    indexed, last_id = 0, 0
+    while True:
+        posts = db.session.execute(
+            db.select(Post.id, Post.title, Post.description, Post.content)
+            .where(Post.id > last_id)
+            .order_by(Post.id)
+            .limit(chunk_size)
+        ).all()
+        if not posts:
+            return indexed
+        backend.index([_document(post) for post in posts])
+        indexed += len(posts)
+        last_id = posts[-1].id
+        if echo:
+            echo(f'Indexed {indexed} posts')
+
+def init_search(app):
+    """Pick the backend for the app's database and make sure its table exists."""
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if dialect not in BACKENDS:
+            logging.warning(f"Full-text search is not supported on {dialect}")
+            return
+        backend = BACKENDS[dialect]()
+        try:
+            backend.create()
+            db.session.commit()
+        except Exception as e:
+            # e.g. an SQLite build without FTS5
+            db.session.rollback()
+            logging.error(f"Could not create the search index: {str(e)}")
+            return
+    app.extensions['search'] = backend
@@ -0,0 +1,244 @@
+import io
+import itertools
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from models import db, User, UserActivity, Post, Comment, Like, SHUFFLE_KEY_SPACE
+
+# Bulk loading of users, posts, comments and likes, either generated from a
+# seed or read from JSONL. Rows are streamed through small per-table buffers
+# and written in batches with one executemany INSERT (or COPY on PostgreSQL)
+# per batch, so memory stays constant however many rows are loaded.
+# Counters are recomputed once at the end by the caller (recount_all).
+
+POST_TYPES = ['poetry', 'story', 'essay', 'theater', 'letter', 'journal']
+
+# Parents first: a batch is only written after the batches it may reference
+TABLES = {model.__tablename__: model.__table__ for model in (User, UserActivity, Post, Comment, Like)}
+TABLE_ORDER = list(TABLES)
+
+WORDS = (
+    'vers rimă metaforă poezie personaj final început ritm imagine emoție atmosferă dialog '
+    'scenă frază ton voce memorie tăcere lumină toamnă mare drum casă copilărie dor timp '
+    'frumos trist profund sincer clar delicat puternic neașteptat subtil convingător'
+).split()
+
+def _column_defaults(table):
+    # Callable defaults are evaluated once per load (created_at), except those
+    # that must differ between rows, which are returned separately
+    defaults, per_row = {}, {}
+    for column in table.columns:
+        default = column.default
+        if column.primary_key or default is None or not default.is_scalar and not default.is_callable:
+            continue
+        if column.info.get('per_row_default'):
+            per_row[column.name] = default.arg
+        else:
+            defaults[column.name] = default.arg if default.is_scalar else default.arg(None)
+    return defaults, per_row
+
+def _copy_value(value):
+    # PostgreSQL COPY text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+class BulkWriter:
+    """Buffers rows per table and writes them in batches on the session's connection."""
+
+    def __init__(self, chunk_size=10000):
+        self.chunk_size = chunk_size
+        self.connection = db.session.connection()
+        self.use_copy = self.connection.dialect.name == 'postgresql'
+        self._buffers = {name: [] for name in TABLE_ORDER}
+        self._defaults, self._per_row_defaults = {}, {}
+        for name, table in TABLES.items():
+            self._defaults[name], self._per_row_defaults[name] = _column_defaults(table)
+        self.counts = {name: 0 for name in TABLE_ORDER}
+
+    def add(self, table_name, row):
+        if table_name not in self._buffers:
+            raise ValueError(f'Unknown table: {table_name}')
+        row = {**self._defaults[table_name], **row}
+        for column, default in self._per_row_defaults[table_name].items():
+            if column not in row:
+                row[column] = default(None)
+        self._buffers[table_name].append(row)
+        if len(self._buffers[table_name]) >= self.chunk_size:
+            self.flush(table_name)
+
+    def flush(self, table_name=None):
+        """Write the buffer of table_name (and of every table it may reference), or all buffers."""
+        last = TABLE_ORDER.index(table_name) if table_name else len(TABLE_ORDER) - 1
+        for name in TABLE_ORDER[:last + 1]:
+            rows = self._buffers[name]
+            if not rows:
+                continue
+            # executemany and COPY need the same columns in every row, so
+            # rows that set different columns (e.g. post vs comment likes) go separately
+            rows.sort(key=lambda row: tuple(row))
+            for _, group in itertools.groupby(rows, key=lambda row: tuple(row)):
+                group = list(group)
+                if self.use_copy:
+                    self._copy(TABLES[name], group)
+                else:
+                    self.connection.execute(TABLES[name].insert(), group)
+            self.counts[name] += len(rows)
+            self._buffers[name] = []
+
+    def _copy(self, table, rows):
+        columns = list(rows[0])
+        data = io.StringIO()
+        for row in rows:
+            data.write('\t'.join(_copy_value(row.get(column)) for column in columns))
+            data.write('\n')
+        data.seek(0)
+        cursor = self.connection.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(f'COPY "{table.name}" ({", ".join(columns)}) FROM STDIN', data)
+        finally:
+            cursor.close()
+
+    def reset_sequences(self):
+        """Move PostgreSQL id sequences past explicitly inserted ids."""
+        if not self.use_copy:
+            return
+        for name in TABLE_ORDER:
+            self.connection.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('\"{name}\"', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM \"{name}\"), 1))"
+            )
+
+def _next_id(model):
+    return (db.session.scalar(db.select(db.func.max(model.id))) or 0) + 1
+
+def sentence(rng, words):
+    """A capitalized sentence of random Romanian words."""
+    return ' '.join(rng.choices(WORDS, k=words)).capitalize() + '.'
+
+def _post_content(rng, post_type):
+    if post_type in ('poetry', 'theater'):
+        return '\n'.join(sentence(rng, rng.randint(4, 9)) for _ in range(rng.randint(8, 40)))
+    paragraphs = rng.randint(2, 12) if post_type == 'story' else rng.randint(1, 5)
+    return '\n\n'.join(sentence(rng, rng.randint(40, 120)) for _ in range(paragraphs))
+
+def _coprime_stride(rng, size):
+    # i -> (i * stride + offset) % size is then a permutation of range(size)
+    while True:
+        stride = rng.randrange(1, size) if size > 1 else 1
+        if math.gcd(stride, size) == 1:
+            return stride
+
+def generate_rows(users, posts, comments, likes, activity_days=30, seed=42, password='password123'):
+    """Yield (table, row) for a deterministic dataset appended after the existing rows.
+
+    A tenth of the likes go to comments. Likes are distinct (user, post) and
+    (user, comment) pairs, drawn from a permutation instead of a set so
+    memory stays constant.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(password)  # Shared by every generated user
+    first_user, first_post, first_comment = _next_id(User), _next_id(Post), _next_id(Comment)
+
+    for i in range(users):
+        user_id = first_user + i
+        yield 'user', {
+            'id': user_id, 'email': f'user{user_id}@example.com', 'name': f'Autor {user_id}',
+            'password_hash': password_hash, 'points': 1000,
+            'created_at': now - timedelta(days=rng.randint(activity_days, 2 * activity_days))
+        }
+        if activity_days:
+            for day in sorted(rng.sample(range(1, activity_days + 1), rng.randint(1, activity_days))):
+                yield 'user_activity', {
+                    'user_id': user_id, 'login_date': (now - timedelta(days=day)).date(), 'points_awarded': True
+                }
+    if not users:
+        return
+
+    span_minutes = max(activity_days, 1) * 24 * 60
+    for i in range(posts):
+        post_type = POST_TYPES[i % len(POST_TYPES)]
+        content = _post_content(rng, post_type)
+        created_at = now - timedelta(minutes=rng.randint(1, span_minutes))
+        yield 'post', {
+            'id': first_post + i, 'title': sentence(rng, rng.randint(1, 5)), 'description': '',
+            'content': content, 'post_length': len(content), 'post_type': post_type,
+            'user_id': first_user + rng.randrange(users), 'created_at': created_at, 'updated_at': created_at,
+            'shuffle_key': rng.randrange(SHUFFLE_KEY_SPACE)
+        }
+    if not posts:
+        return
+
+    for i in range(comments):
+        # Half of the comments go to a minority of popular posts, as on the real site
+        if rng.random() < 0.5:
+            post_offset = min(int(rng.paretovariate(1.2)), posts) - 1
+        else:
+            post_offset = rng.randrange(posts)
+        content = sentence(rng, rng.randint(5, 60))
+        yield 'comment', {
+            'id': first_comment + i, 'content': content, 'comment_length': len(content),
+            'post_id': first_post + post_offset, 'user_id': first_user + rng.randrange(users),
+            'ai_score': rng.randint(0, 100), 'ai_feedback': sentence(rng, 12), 'evaluation_status': 'done',
+            'created_at': now - timedelta(minutes=rng.randint(1, span_minutes))
+        }
+
+    pairs = users * posts
+    post_likes = min(likes - likes // 10, pairs)
+    stride, offset = _coprime_stride(rng, pairs), rng.randrange(pairs)
+    for i in range(post_likes):
+        user_offset, post_offset = divmod((i * stride + offset) % pairs, posts)
+        yield 'like', {'user_id': first_user + user_offset, 'post_id': first_post + post_offset}
+    if comments:
+        pairs = users * comments
+        stride, offset = _coprime_stride(rng, pairs), rng.randrange(pairs)
+        for i in range(min(likes // 10, pairs)):
+            user_offset, comment_offset = divmod((i * stride + offset) % pairs, comments)
+            yield 'like', {'user_id': first_user + user_offset, 'comment_id': first_comment + comment_offset}
+
+def read_jsonl(paths):
+    """Yield (table, row) from JSONL files whose lines look like {"table": "post", ...columns}."""
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                table_name = row.pop('table', None)
+                if table_name not in TABLES:
+                    raise ValueError(f'{path}:{line_number}: unknown or missing table {table_name!r}')
+                # JSON has no datetime type; accept ISO strings
+                for column in ('created_at', 'updated_at'):
+                    if isinstance(row.get(column), str):
+                        row[column] = datetime.fromisoformat(row[column])
+                if isinstance(row.get('login_date'), str):
+                    row['login_date'] = datetime.fromisoformat(row['login_date']).date()
+                yield table_name, row
+
+def bulk_load(records, chunk_size=10000, echo=print, report_every=100000):
+    """Write (table, row) records in batches. Returns ({table: rows}, seconds).
+
+    The caller commits.
+    """
+    writer = BulkWriter(chunk_size)
+    started = time.perf_counter()
+    total = 0
+    for table_name, row in records:
+        writer.add(table_name, row)
+        total += 1
+        if report_every and total % report_every == 0:
+            elapsed = time.perf_counter() - started
+            echo(f'{total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)')
+    writer.flush()
+    writer.reset_sequences()
+    return writer.counts, time.perf_counter() - started
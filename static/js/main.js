@@ -256,7 +256,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     if (data.warning) {
                         showModal(data.warning, 'warning');
                     } else {
-                        showModal(`Comentariu adăugat cu succes! Ai primit ${data.points_awarded} puncte.`);
+                        showModal('Comentariu adăugat cu succes! Punctele vor fi acordate după evaluarea AI.');
                     }
                     // Reload the page to show the new comment
                     window.location.reload();
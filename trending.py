@@ -0,0 +1,118 @@
+import math
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event
+from models import db, Post, Comment, Like
+from config import Config
+from feed import bump_feed_generation
+
+# Time-decayed "hot" score behind the trending feed. Every event on a post
+# (its publication, a like, a comment, the comment's AI score) adds
+#     weight * 2 ** ((event time - now) / half-life)
+# to the post's heat. Since every post decays at the same rate, ranking by
+# that sum is the same as ranking by
+#     log(sum of weight * exp((event time - EPOCH) / tau))
+# which no longer depends on the current time. Post.hot_score stores this
+# logarithm, so it never has to be decayed, a new event is one atomic
+# log-add in an UPDATE, and the feed is an index range scan on hot_score.
+# An unlike or a deleted comment takes its event back with a log-subtract,
+# so toggling a like leaves the score where it was. Guest likes and rescored
+# comments are only picked up by `flask recompute-trending`, which rebuilds
+# every score from the base tables and is meant to run periodically.
+
+EPOCH = datetime(2025, 1, 1)
+
+def event_score(weight, at=None):
+    """The log-space contribution of an event of the given weight at time `at` (default now)."""
+    tau = Config.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+    return math.log(weight) + ((at or datetime.utcnow()) - EPOCH).total_seconds() / tau
+
+def _log_add(column, score):
+    # log(exp(column) + exp(score)), arranged so exp() never overflows
+    return db.case(
+        (column >= score, column + db.func.ln(1 + db.func.exp(score - column))),
+        else_=score + db.func.ln(1 + db.func.exp(column - score))
+    )
+
+def _log_sub(column, score):
+    # log(exp(column) - exp(score)); unchanged if the score no longer holds the
+    # event (e.g. recomputed since), as ln() of a value <= 0 is undefined
+    return db.case(
+        (column > score, column + db.func.ln(1 - db.func.exp(score - column))),
+        else_=column
+    )
+
+def record_heat(post, weight, at=None):
+    """Add an event to a post's hot score with "SET hot_score = <log-add>". Does not commit."""
+    if weight > 0:
+        post.hot_score = _log_add(Post.hot_score, event_score(weight, at))
+
+def remove_heat(post, *events):
+    """Take back events given as (weight, at) pairs, added earlier with record_heat. Does not commit.
+
+    All events go into one assignment, since a second one would replace the first.
+    """
+    scores = [event_score(weight, at) for weight, at in events if weight > 0]
+    if scores:
+        post.hot_score = _log_sub(Post.hot_score, _log_sum(scores))
+
+def _log_sum(scores):
+    top = max(scores)
+    return top + math.log(sum(math.exp(score - top) for score in scores))
+
+def recompute_hot_scores(chunk_size=1000, echo=None):
+    """Rebuild every Post.hot_score from posts, likes and comments, chunk_size posts at a time.
+
+    Returns the number of posts updated. Bumps the feed generation, since the
+    trending order changes. The caller commits.
+    """
+    updated, last_id = 0, 0
+    posts_table = Post.__table__
+    while True:
+        posts = db.session.execute(
+            db.select(Post.id, Post.created_at).where(Post.id > last_id).order_by(Post.id).limit(chunk_size)
+        ).all()
+        if not posts:
+            if updated:
+                bump_feed_generation()
+            return updated
+        first, last_id = posts[0].id, posts[-1].id
+
+        created = {post.id: post.created_at or EPOCH for post in posts}
+        scores = defaultdict(list)
+        for post_id, created_at in created.items():
+            scores[post_id].append(event_score(Config.TRENDING_POST_WEIGHT, created_at))
+        for post_id, created_at in db.session.execute(
+            db.select(Like.post_id, Like.created_at).where(Like.post_id.between(first, last_id))
+        ):
+            scores[post_id].append(event_score(Config.TRENDING_LIKE_WEIGHT, created_at or created[post_id]))
+        for post_id, created_at, ai_score in db.session.execute(
+            db.select(Comment.post_id, Comment.created_at, Comment.ai_score).where(Comment.post_id.between(first, last_id))
+        ):
+            at = created_at or created[post_id]
+            scores[post_id].append(event_score(Config.TRENDING_COMMENT_WEIGHT, at))
+            if ai_score:
+                scores[post_id].append(event_score(Config.TRENDING_QUALITY_WEIGHT * ai_score / 100, at))
+
+        db.session.execute(
+            posts_table.update().where(posts_table.c.id == db.bindparam('pid')).values(hot_score=db.bindparam('score')),
+            [{'pid': post_id, 'score': _log_sum(values)} for post_id, values in scores.items()]
+        )
+        updated += len(posts)
+        if echo:
+            echo(f'Recomputed {updated} hot scores')
+
+def _add_math_functions(dbapi_connection, connection_record):
+    # ln() and exp() are only built into SQLite 3.35+ compiled with the math functions
+    try:
+        dbapi_connection.execute('SELECT ln(1), exp(0)')
+    except Exception:
+        dbapi_connection.create_function('ln', 1, math.log, deterministic=True)
+        dbapi_connection.create_function('exp', 1, math.exp, deterministic=True)
+
+def init_trending(app):
+    """Make sure SQLite connections have ln() and exp(). Must run before the first connection."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _add_math_functions)
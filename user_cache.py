@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models import db, User
+from config import Config
+
+# Identity cache behind Flask-Login's user_loader. Instead of a primary-key
+# SELECT per authenticated request, the session user's columns are kept in a
+# bounded, thread-safe LRU for USER_CACHE_TTL seconds and turned back into a
+# session-bound User with merge(load=False), which emits no SQL. Lazy
+# relationships and writes to current_user keep working as before.
+#
+# Entries are dropped after the commit of any change to the user: a flush of a
+# modified User row (profile, password, likes received) or a points ledger
+# event, which every points change writes (ledger.py). Dropping after the
+# commit, not at the change, keeps a concurrent request from caching the old
+# row again. Caches are per process, so other workers can show a change up to
+# USER_CACHE_TTL seconds late.
+
+# Needed for authentication checks only, and not worth keeping in memory
+UNCACHED_COLUMNS = {'password_hash'}
+
+class UserCache:
+    """LRU of user column values with a per-entry expiry."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0  # Bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, values, generation):
+        """Store values read while the cache was at `generation`; dropped if anything was invalidated since."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+def _values(user):
+    # Only what is already loaded; anything else stays unloaded and is fetched on access
+    return {
+        column.key: user.__dict__[column.key]
+        for column in User.__table__.columns
+        if column.key in user.__dict__ and column.key not in UNCACHED_COLUMNS
+    }
+
+def load_user(user_id):
+    """The User for a session, from the cache when possible."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        return db.session.get(User, user_id)
+    values = cache.get(user_id)
+    if values is None:
+        generation = cache.generation
+        user = db.session.get(User, user_id)
+        if user is not None:
+            cache.set(user_id, _values(user), generation)
+        return user
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+def mark_users_changed(user_ids):
+    """Drop these users from the cache once the current transaction commits."""
+    db.session.info.setdefault('changed_users', set()).update(user_ids)
+
+def invalidate_users(user_ids):
+    """Drop these users from the cache right away."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.invalidate(user_ids)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = {obj.id for obj in session.dirty | session.deleted if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault('changed_users', set()).update(changed)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    changed = session.info.pop('changed_users', None)
+    if changed and has_app_context():
+        invalidate_users(changed)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_users', None)
+
+def init_user_cache(app):
+    # USER_CACHE_SIZE = 0 in the app config turns the cache off, e.g. for comparisons
+    size = app.config.get('USER_CACHE_SIZE', Config.USER_CACHE_SIZE)
+    if size > 0:
+        app.extensions['user_cache'] = UserCache(size, Config.USER_CACHE_TTL)
+
+def get_user_cache():
+    return current_app.extensions.get('user_cache')